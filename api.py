@@ -0,0 +1,256 @@
+"""JSON HTTP API over the search core, for dashboards and mobile clients.
+
+    uvicorn api:app --host 0.0.0.0 --port 8000
+
+    GET /search?q=Connaught+Place+Delhi&radius=5&types=Hospital,Police+Station
+    GET /search?lat=28.63&lon=77.22&radius=5&types=Hospital
+    GET /search?q=Connaught+Place+Delhi&nearest=5&types=Hospital,Police+Station
+    GET /search?q=Connaught+Place+Delhi&radius=5&types=Pharmacy&open=only&at=2026-01-05T23:30
+    GET /export?q=Connaught+Place+Delhi&radius=30&types=Hospital&format=geojson
+    GET /suggest?q=conn
+    GET /types
+    GET /metrics
+    GET /prewarm
+
+Responses carry an ETag and Cache-Control; repeat requests are answered
+from a shared in-process response cache without touching the pipeline.
+When Overpass fails for some types the results that could be found are
+returned uncached, with those types under `failed_types`; when it fails for
+all of them and nothing was found, or Nominatim fails, the answer is a 502.
+With `nearest=K` the search grows outward until each type has K results,
+`radius` (default the largest) being the furthest it may go.
+`open=only` keeps results known to be open at `at` (ISO time, default now;
+naive times are HOURS_TZ local time), `open=first` moves them to the front,
+and either adds an `open` field (true, false or null if unknown) to each row.
+Exports (csv, geojson, parquet, txt) include every result and are streamed
+in chunks as they are generated. /suggest answers type-ahead from the local
+gazetteer (GAZETTEER_PATH) and is empty without one.
+"""
+import hashlib
+import importlib.util
+import json
+import math
+import os
+from datetime import datetime
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from exports import FORMATS, iter_export_bytes
+from fetch_engine import FetchError
+from geocode_cache import normalize_query
+from metrics import metrics, trace
+from opening_hours import UNKNOWN
+from overpass import SERVICE_TAGS
+from prewarm import start_prewarm
+from search_core import GAZETTEER_PATH, RADII, RESULT_TTL, SearchCore
+from ttl_cache import TTLCache
+
+DEFAULT_TYPES = ["Hospital"]
+MAX_NEAREST = 50
+OPEN_MODES = ('only', 'first')
+MAX_SUGGESTIONS = 20
+
+# Seconds clients and proxies may reuse a response
+API_MAX_AGE = int(os.environ.get("API_MAX_AGE", "300"))
+API_CACHE_SIZE = int(os.environ.get("API_CACHE_SIZE", "10000"))
+
+core = SearchCore()
+prewarmer = start_prewarm(core)
+responses = TTLCache(ttl=RESULT_TTL, max_entries=API_CACHE_SIZE)
+
+
+def error(status, message):
+    return JSONResponse({'error': message}, status_code=status)
+
+
+def parse_params(params):
+    """(place key or (lat, lon), radius, types, nearest, hours) from query params; raises ValueError.
+
+    `hours` is None or (open mode, time to the minute).
+    """
+    nearest = int(params.get('nearest', 0))
+    if not 0 <= nearest <= MAX_NEAREST:
+        raise ValueError(f"nearest must be between 1 and {MAX_NEAREST}, or 0 for a radius search")
+    radius = float(params.get('radius', max(RADII) if nearest else 10))
+    if not 0 < radius <= max(RADII):
+        raise ValueError(f"radius must be between 0 and {max(RADII)} km")
+
+    types = [t.strip() for t in params.get('types', '').split(',') if t.strip()] or DEFAULT_TYPES
+    unknown = [t for t in types if t not in SERVICE_TAGS]
+    if unknown:
+        raise ValueError(f"unknown types: {', '.join(unknown)}")
+    types = tuple(t for t in SERVICE_TAGS if t in types)
+
+    if 'lat' in params and 'lon' in params:
+        lat, lon = float(params['lat']), float(params['lon'])
+        if not (math.isfinite(lat) and math.isfinite(lon) and -90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError("lat must be between -90 and 90 and lon between -180 and 180")
+        where = (round(lat, 5), round(lon, 5))
+    elif params.get('q', '').strip():
+        where = normalize_query(params['q'])
+    else:
+        raise ValueError("pass either q or lat and lon")
+
+    hours = None
+    if 'open' in params:
+        if params['open'] not in OPEN_MODES:
+            raise ValueError(f"open must be one of {', '.join(OPEN_MODES)}")
+        # Part of the response cache key, so "now" is cut to the minute
+        at = datetime.fromisoformat(params['at']) if params.get('at') else datetime.now().astimezone()
+        hours = (params['open'], at.replace(second=0, microsecond=0))
+    return where, radius, types, nearest, hours
+
+
+def run_search(where, radius, types, nearest, hours):
+    with trace("api", radius_km=radius, types=list(types), nearest=nearest):
+        return _run_search(where, radius, types, nearest, hours)
+
+
+def search_results(where, radius, types, nearest=0, hours=None):
+    """(location dict, ResultSet nearest first, {type: radius searched}, [types whose fetch failed]),
+    or None if the place isn't found; raises FetchError if geocoding failed upstream.
+
+    With `hours` (see parse_params) the results are filtered or reordered by whether they're open.
+    """
+    if isinstance(where, tuple):
+        lat, lon = where
+        location = {'address': None, 'lat': lat, 'lon': lon}
+    else:
+        found = core.geocode_location(where)
+        if found is None:
+            return None
+        lat, lon = found.latitude, found.longitude
+        location = {'address': found.address, 'lat': lat, 'lon': lon}
+    failed = []
+
+    def on_error(r_type, e):
+        failed.append(r_type)
+
+    if nearest:
+        results, searched = core.fetch_nearest(lat, lon, nearest, types, radius, on_error=on_error)
+    else:
+        results = core.fetch_resources(lat, lon, radius, types, on_error=on_error)
+        searched = dict.fromkeys(types, radius)
+    results = results.sorted()
+    if hours is not None:
+        mode, at = hours
+        results = results.open_only(at) if mode == 'only' else results.open_first(at)
+    return location, results, searched, [t for t in types if t in failed]
+
+
+def _run_search(where, radius, types, nearest, hours):
+    found = search_results(where, radius, types, nearest, hours)
+    if found is None:
+        return None
+    location, results, searched, failed = found
+    payload = {'location': location, 'radius_km': radius, 'types': list(types), 'count': len(results)}
+    if nearest:
+        payload.update(nearest=nearest, searched_km=searched)
+    if failed:
+        payload['failed_types'] = failed
+    records = results.records()
+    if hours is not None:
+        payload.update(open=hours[0], at=hours[1].isoformat())
+        for record, status in zip(records, results.open_at(hours[1]).tolist()):
+            record['open'] = None if status == UNKNOWN else bool(status)
+    payload['results'] = records
+    return payload
+
+
+def cached_response(request, etag, body):
+    headers = {'ETag': etag, 'Cache-Control': f"public, max-age={API_MAX_AGE}"}
+    if etag in request.headers.get('if-none-match', ''):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type='application/json', headers=headers)
+
+
+async def search(request):
+    try:
+        key = parse_params(request.query_params)
+    except ValueError as e:
+        return error(400, str(e))
+
+    hit = responses.get(key)
+    metrics.inc("cache_requests_total", cache="api", result="miss" if hit is None else "hit")
+    if hit is None:
+        try:
+            payload = await run_in_threadpool(run_search, *key)
+        except FetchError as e:
+            return error(502, str(e))
+        if payload is None:
+            return error(404, "location not found")
+        body = json.dumps(payload, separators=(',', ':')).encode()
+        if 'failed_types' in payload:
+            # Partial answers during an upstream outage are neither cached here nor by clients
+            if not payload['count']:
+                return error(502, f"Overpass failed for {', '.join(payload['failed_types'])}")
+            return Response(body, media_type='application/json', headers={'Cache-Control': 'no-store'})
+        hit = (f'"{hashlib.sha1(body).hexdigest()}"', body)
+        responses.set(key, hit)
+    return cached_response(request, *hit)
+
+
+async def export(request):
+    fmt = request.query_params.get('format', 'csv')
+    if fmt not in FORMATS:
+        return error(400, f"format must be one of {', '.join(FORMATS)}")
+    if fmt == 'parquet' and importlib.util.find_spec('pyarrow') is None:
+        return error(501, "parquet export needs pyarrow on the server")
+    try:
+        key = parse_params(request.query_params)
+    except ValueError as e:
+        return error(400, str(e))
+
+    with trace("export", radius_km=key[1], types=list(key[2]), format=fmt):
+        try:
+            found = await run_in_threadpool(search_results, *key)
+        except FetchError as e:
+            return error(502, str(e))
+    if found is None:
+        return error(404, "location not found")
+    location, results, _, failed = found
+    if failed and not len(results):
+        return error(502, f"Overpass failed for {', '.join(failed)}")
+    media_type, ext = FORMATS[fmt]
+    place = location['address'] or f"{location['lat']},{location['lon']}"
+    return StreamingResponse(iter_export_bytes(results, fmt, place), media_type=media_type,
+                             headers={'Content-Disposition': f'attachment; filename="services.{ext}"'})
+
+
+async def suggest(request):
+    try:
+        limit = int(request.query_params.get('limit', 8))
+    except ValueError as e:
+        return error(400, str(e))
+    if not 1 <= limit <= MAX_SUGGESTIONS:
+        return error(400, f"limit must be between 1 and {MAX_SUGGESTIONS}")
+    suggestions = core.suggest_places(request.query_params.get('q', ''), limit)
+    return JSONResponse({'suggestions': suggestions},
+                        headers={'Cache-Control': f'public, max-age={API_MAX_AGE}'} if GAZETTEER_PATH else {})
+
+
+async def types(request):
+    return JSONResponse({'types': list(SERVICE_TAGS), 'radii': RADII})
+
+
+async def prometheus(request):
+    return Response(metrics.prometheus(), media_type='text/plain; version=0.0.4')
+
+
+async def prewarm_status(request):
+    if prewarmer is None:
+        return error(404, "prewarming is not configured (PREWARM_PLACES)")
+    return JSONResponse({'entries': prewarmer.status()})
+
+
+app = Starlette(routes=[
+    Route('/search', search),
+    Route('/export', export),
+    Route('/suggest', suggest),
+    Route('/types', types),
+    Route('/metrics', prometheus),
+    Route('/prewarm', prewarm_status),
+])
@@ -1,452 +1,112 @@
 import streamlit as st
-import pandas as pd
-from geopy.geocoders import Nominatim
-from geopy.distance import geodesic
-import requests
-from datetime import datetime
-import folium
-from streamlit_folium import folium_static
+import hashlib
+import importlib
+import os
+import threading
 import time
+from datetime import datetime
+from cards import card_html
+from exports import FORMATS, export_bytes
+from fetch_engine import FetchError
+from geocode_cache import normalize_query
+from map_render import CLUSTER_THRESHOLD, map_html
+from results import ResultSet
+from metrics import span, trace
+from prewarm import start_prewarm
+from search_core import GAZETTEER_PATH, NEAREST_K, RADII, RESULT_TTL, SearchCore
+
+# Result count above which map markers are clustered and drawn client-side
+MAP_CLUSTER_THRESHOLD = int(os.environ.get("MAP_CLUSTER_THRESHOLD", str(CLUSTER_THRESHOLD)))
+# Stage timing waterfall under the results (also with ?debug=1 in the URL)
+DEBUG_PANEL = os.environ.get("DEBUG_PANEL") == "1"
+# Link the stylesheet from static/ (browser-cached) instead of sending it inline on every rerun;
+# needs server.enableStaticServing (.streamlit/config.toml), STATIC_ASSETS=0 inlines it
+STATIC_ASSETS = os.environ.get("STATIC_ASSETS", "1") == "1"
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+# Imported in the background once the first page is out, so the first search doesn't wait for them
+PRELOAD_MODULES = ["folium", "folium.plugins"]
 
 st.set_page_config(
     page_title="Emergency Services India",
     layout="wide"
 )
 
-# Modern, clean design
-st.markdown("""
-    <style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600&display=swap');
-    
-    * {
-        font-family: 'Inter', sans-serif;
-    }
-    
-    .main {
-        padding: 1rem 2rem;
-        max-width: 1200px;
-        margin: 0 auto;
-    }
-    
-    .stApp {
-        background: #fafbfc;
-    }
-    
-    /* Modern Header */
-    .top-header {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        color: white;
-        padding: 1.5rem;
-        border-radius: 12px;
-        margin-bottom: 1.5rem;
-        text-align: center;
-    }
-    
-    .top-header h1 {
-        margin: 0;
-        font-size: 1.6rem;
-        font-weight: 600;
-    }
-    
-    /* Emergency Numbers - Modern Grid */
-    .emergency-grid {
-        display: grid;
-        grid-template-columns: repeat(5, 1fr);
-        gap: 0.8rem;
-        margin: 1.5rem 0;
-    }
-    
-    .emergency-card {
-        background: white;
-        border: 1px solid #e1e8ed;
-        border-radius: 10px;
-        padding: 1rem;
-        text-align: center;
-        transition: all 0.2s;
-    }
-    
-    .emergency-card:hover {
-        transform: translateY(-3px);
-        box-shadow: 0 4px 12px rgba(0,0,0,0.1);
-        border-color: #667eea;
-    }
-    
-    .em-icon {
-        font-size: 1.5rem;
-    }
-    
-    .em-num {
-        font-size: 1.5rem;
-        font-weight: 700;
-        color: #dc2626;
-        margin: 0.3rem 0;
-    }
-    
-    .em-label {
-        font-size: 0.8rem;
-        color: #6b7280;
-    }
-    
-    /* Modern Search Box */
-    .search-box {
-        background: white;
-        border-radius: 12px;
-        padding: 1.5rem;
-        box-shadow: 0 2px 8px rgba(0,0,0,0.06);
-        margin: 1.5rem 0;
-    }
-    
-    .search-title {
-        font-size: 1rem;
-        font-weight: 600;
-        color: #1f2937;
-        margin-bottom: 1rem;
-    }
-    
-    /* Modern Service Selector */
-    .service-selector {
-        background: #f9fafb;
-        border-radius: 10px;
-        padding: 1rem;
-        margin: 1rem 0;
-    }
-    
-    .service-row {
-        display: flex;
-        gap: 0.5rem;
-        flex-wrap: wrap;
-        margin-top: 0.5rem;
-    }
-    
-    .service-chip {
-        background: white;
-        border: 2px solid #e5e7eb;
-        border-radius: 20px;
-        padding: 0.4rem 1rem;
-        font-size: 0.85rem;
-        cursor: pointer;
-        transition: all 0.2s;
-    }
-    
-    .service-chip:hover {
-        border-color: #667eea;
-        background: #f3f4f6;
-    }
-    
-    .service-chip.active {
-        background: #667eea;
-        color: white;
-        border-color: #667eea;
-    }
-    
-    /* Stats - Modern */
-    .stats-grid {
-        display: grid;
-        grid-template-columns: repeat(3, 1fr);
-        gap: 1rem;
-        margin: 1.5rem 0;
-    }
-    
-    .stat-card {
-        background: white;
-        border-radius: 10px;
-        padding: 1rem;
-        text-align: center;
-        box-shadow: 0 2px 8px rgba(0,0,0,0.06);
-    }
-    
-    .stat-num {
-        font-size: 2rem;
-        font-weight: 700;
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-    }
-    
-    .stat-label {
-        font-size: 0.8rem;
-        color: #6b7280;
-        margin-top: 0.3rem;
-    }
-    
-    /* Result Cards - Modern */
-    .result-card {
-        background: white;
-        border-radius: 10px;
-        padding: 1.2rem;
-        margin: 0.8rem 0;
-        box-shadow: 0 2px 6px rgba(0,0,0,0.06);
-        border-left: 4px solid #667eea;
-        transition: all 0.2s;
-    }
-    
-    .result-card:hover {
-        box-shadow: 0 4px 12px rgba(0,0,0,0.12);
-        transform: translateX(4px);
-    }
-    
-    .result-top {
-        display: flex;
-        justify-content: space-between;
-        align-items: center;
-        margin-bottom: 0.8rem;
-    }
-    
-    .result-name {
-        font-size: 1.05rem;
-        font-weight: 600;
-        color: #1f2937;
-    }
-    
-    .result-badge {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        color: white;
-        padding: 0.3rem 0.8rem;
-        border-radius: 15px;
-        font-size: 0.8rem;
-        font-weight: 600;
-    }
-    
-    .result-detail {
-        font-size: 0.9rem;
-        color: #4b5563;
-        margin: 0.4rem 0;
-    }
-    
-    .result-detail strong {
-        color: #1f2937;
-    }
-    
-    .result-actions {
-        display: flex;
-        gap: 0.6rem;
-        margin-top: 1rem;
-    }
-    
-    .btn-modern {
-        padding: 0.5rem 1.2rem;
-        border-radius: 8px;
-        text-decoration: none;
-        font-size: 0.85rem;
-        font-weight: 500;
-        transition: all 0.2s;
-    }
-    
-    .btn-green {
-        background: #10b981;
-        color: white;
-    }
-    
-    .btn-green:hover {
-        background: #059669;
-        transform: translateY(-2px);
-    }
-    
-    .btn-blue {
-        background: #3b82f6;
-        color: white;
-    }
-    
-    .btn-blue:hover {
-        background: #2563eb;
-        transform: translateY(-2px);
-    }
-    
-    /* Section Header */
-    .section-header {
-        font-size: 1.2rem;
-        font-weight: 600;
-        color: #1f2937;
-        margin: 2rem 0 1rem 0;
-        padding-bottom: 0.6rem;
-        border-bottom: 2px solid #e5e7eb;
-    }
-    
-    .type-title {
-        font-size: 1rem;
-        font-weight: 600;
-        color: #374151;
-        margin: 1.2rem 0 0.6rem 0;
-    }
-    
-    .count {
-        background: #667eea;
-        color: white;
-        padding: 0.2rem 0.6rem;
-        border-radius: 12px;
-        font-size: 0.75rem;
-        margin-left: 0.5rem;
-    }
-    
-    /* Buttons */
-    .stButton>button {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        color: white;
-        border: none;
-        border-radius: 8px;
-        padding: 0.6rem 2rem;
-        font-weight: 500;
-        transition: all 0.2s;
-    }
-    
-    .stButton>button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 4px 12px rgba(102, 126, 234, 0.4);
-    }
-    
-    /* Hide Streamlit branding */
-    #MainMenu {visibility: hidden;}
-    footer {visibility: hidden;}
-    header {visibility: hidden;}
-    
-    /* Footer */
-    .footer {
-        text-align: center;
-        font-size: 0.85rem;
-        color: #9ca3af;
-        padding: 2rem 0;
-        margin-top: 2rem;
-        border-top: 1px solid #e5e7eb;
-    }
-    
-    @media (max-width: 768px) {
-        .emergency-grid {
-            grid-template-columns: repeat(2, 1fr);
-        }
-        .stats-grid {
-            grid-template-columns: 1fr;
-        }
-    }
-    </style>
-""", unsafe_allow_html=True)
-
-# Modern Header - NO "hospital" word
-st.markdown("""
-    <div class="top-header">
-        <h1>  Emergency Services Finder - India</h1>
-    </div>
-""", unsafe_allow_html=True)
-
-# Emergency Numbers
-st.markdown("""
-    <div class="emergency-grid">
-        <div class="emergency-card">
-            <div class="em-icon">🚔</div>
-            <div class="em-num">100</div>
-            <div class="em-label">Police</div>
-        </div>
-        <div class="emergency-card">
-            <div class="em-icon">🚒</div>
-            <div class="em-num">101</div>
-            <div class="em-label">Fire</div>
-        </div>
-        <div class="emergency-card">
-            <div class="em-icon">🚑</div>
-            <div class="em-num">108</div>
-            <div class="em-label">Ambulance</div>
-        </div>
-        <div class="emergency-card">
-            <div class="em-icon">👮</div>
-            <div class="em-num">1091</div>
-            <div class="em-label">Women</div>
-        </div>
-        <div class="emergency-card">
-            <div class="em-icon">⚠️</div>
-            <div class="em-num">1078</div>
-            <div class="em-label">Disaster</div>
-        </div>
-    </div>
-""", unsafe_allow_html=True)
+@st.cache_resource
+def static_head():
+    with open(os.path.join(STATIC_DIR, "app.css"), encoding="utf-8") as f:
+        css = f.read()
+    with open(os.path.join(STATIC_DIR, "header.html"), encoding="utf-8") as f:
+        header = f.read()
+    if STATIC_ASSETS:
+        # Versioned so a deploy with new styles isn't served a stale cached copy
+        style = f'<link rel="stylesheet" href="app/static/app.css?v={hashlib.sha1(css.encode()).hexdigest()[:10]}">'
+    else:
+        style = f"<style>\n{css}</style>"
+    return style + "\n" + header
+
+@st.cache_resource
+def preload_modules():
+    def run():
+        for name in PRELOAD_MODULES:
+            importlib.import_module(name)
+    thread = threading.Thread(target=run, name="preload", daemon=True)
+    thread.start()
+    return thread
+
+st.markdown(static_head(), unsafe_allow_html=True)
 
 # Functions
-@st.cache_data(ttl=3600)
+@st.cache_resource
+def search_core():
+    return SearchCore()
+
+@st.cache_resource
+def prewarmer():
+    # One refresh thread per process, shared by every session
+    return start_prewarm(search_core())
+
 def geocode_location(place_name):
-    try:
-        geolocator = Nominatim(user_agent="emergency_finder_india")
-        return geolocator.geocode(place_name + ", India", timeout=10)
-    except:
-        return None
-
-@st.cache_data(ttl=1800)
-def fetch_resources(lat, lon, radius_km, selected_types):
-    queries = {
-        "Hospital": '[amenity=hospital]', "Clinic": '[amenity=clinic]',
-        "Pharmacy": '[amenity=pharmacy]', "Doctors": '[amenity=doctors]',
-        "Police Station": '[amenity=police]', "Fire Station": '[amenity=fire_station]',
-        "ATM": '[amenity=atm]', "Embassy": '[amenity=embassy]',
-        "Tourist Office": '[tourism=information]'
-    }
-    
-    queries = {k: v for k, v in queries.items() if k in selected_types}
-    results = []
-    url = "https://overpass-api.de/api/interpreter"
-    
-    progress = st.progress(0)
+    return search_core().geocode_location(place_name)
+
+HOURS_MODES = {'any': "Any hours", 'first': "Open now first", 'only': "Open now only"}
+# Radius option that searches outward until each service has NEAREST_K results
+NEAREST = "nearest"
+
+def stream_resources(lat, lon, radius_km, selected_types):
+    # Yields (type, batch, radius searched); progress only shows up once an upstream request actually goes out
+    progress = st.empty()
     status = st.empty()
     
-    for idx, (r_type, tag) in enumerate(queries.items()):
-        status.text(f"Searching {r_type}...")
-        
-        try:
-            q = f"""
-            [out:json][timeout:30];
-            (
-              node(around:{radius_km*1000},{lat},{lon}){tag};
-              way(around:{radius_km*1000},{lat},{lon}){tag};
-              relation(around:{radius_km*1000},{lat},{lon}){tag};
-            );
-            out center 200;
-            """
-            
-            res = requests.get(url, params={'data': q}, timeout=35)
-            res.raise_for_status()
-            data = res.json()
-            
-            for elem in data.get('elements', []):
-                tags = elem.get('tags', {})
-                
-                name = tags.get('name') or tags.get('name:en') or tags.get('brand') or tags.get('operator')
-                if not name:
-                    city = tags.get('addr:city', '')
-                    area = tags.get('addr:suburb', tags.get('addr:locality', ''))
-                    if city or area:
-                        name = f"{r_type} in {area or city}".strip()
-                    else:
-                        continue
-                
-                if 'lat' in elem and 'lon' in elem:
-                    rlat, rlon = elem['lat'], elem['lon']
-                elif 'center' in elem:
-                    rlat, rlon = elem['center']['lat'], elem['center']['lon']
-                else:
-                    continue
-                
-                dist = round(geodesic((lat, lon), (rlat, rlon)).km, 2)
-                phone = tags.get('phone', tags.get('contact:phone', 'N/A'))
-                hours = tags.get('opening_hours', 'N/A')
-                
-                addr_parts = [tags.get(k, '') for k in ['addr:housenumber', 'addr:street', 'addr:suburb', 'addr:city', 'addr:state'] if tags.get(k)]
-                address = ', '.join(addr_parts) if addr_parts else tags.get('addr:full', 'N/A')
-                
-                maps = f"https://www.google.com/maps/search/?api=1&query={rlat},{rlon}"
-                dirs = f"https://www.google.com/maps/dir/?api=1&origin={lat},{lon}&destination={rlat},{rlon}"
-                
-                results.append({
-                    'Name': name, 'Type': r_type, 'Distance_km': dist,
-                    'Address': address, 'Phone': phone, 'Hours': hours,
-                    'Latitude': rlat, 'Longitude': rlon,
-                    'Google_Maps': maps, 'Directions': dirs
-                })
-            
-            time.sleep(0.5)
-        except:
-            pass
-        
-        progress.progress((idx + 1) / len(queries))
+    def on_progress(text, fraction):
+        status.text(text)
+        progress.progress(fraction)
     
-    progress.empty()
-    status.empty()
-    return results
+    try:
+        if radius_km == NEAREST:
+            yield from search_core().stream_nearest(lat, lon, NEAREST_K, selected_types, max(RADII),
+                                                    on_progress=on_progress)
+        else:
+            for stype, batch in search_core().stream_resources(lat, lon, radius_km, selected_types,
+                                                               on_progress=on_progress):
+                yield stype, batch, radius_km
+    finally:
+        progress.empty()
+        status.empty()
+
+def pick_place(label):
+    st.session_state.place = label
+
+@st.fragment
+def place_input():
+    # Reruns on its own while the user types, so suggestions don't re-render the page
+    text = st.text_input("Enter location", key="place", live="200ms",
+                         placeholder="e.g., Connaught Place Delhi, Marine Drive Mumbai", label_visibility="collapsed")
+    suggestions = search_core().suggest_places(text, 6) if text.strip() else []
+    if not any(s['label'] == text for s in suggestions):
+        for i, place in enumerate(suggestions):
+            st.button(place['label'], key=f"suggest_{i}", type="tertiary", on_click=pick_place, args=(place['label'],))
+
+prewarmer()
 
 # Modern Search Box
 st.markdown('<div class="search-box">', unsafe_allow_html=True)
@@ -454,9 +114,14 @@ st.markdown('<div class="search-title"> Search for Services</div>', unsafe_allow
 
 col1, col2 = st.columns([5, 1])
 with col1:
-    place_name = st.text_input("Enter location", placeholder="e.g., Connaught Place Delhi, Marine Drive Mumbai", label_visibility="collapsed")
+    if GAZETTEER_PATH:
+        place_input()
+        place_name = st.session_state.place
+    else:
+        place_name = st.text_input("Enter location", placeholder="e.g., Connaught Place Delhi, Marine Drive Mumbai", label_visibility="collapsed")
 with col2:
-    radius_km = st.selectbox("Radius", [2, 5, 10, 15, 20, 30], index=2, format_func=lambda x: f"{x} km", label_visibility="collapsed")
+    radius_km = st.selectbox("Radius", RADII + [NEAREST], index=2, label_visibility="collapsed",
+                             format_func=lambda x: f"Nearest {NEAREST_K}" if x == NEAREST else f"{x} km")
 
 st.markdown('<div class="search-title" style="margin-top: 1rem;">Select Services</div>', unsafe_allow_html=True)
 
@@ -495,6 +160,10 @@ with col3:
 
 resource_filter = medical + emergency + other
 
+# Applied when results are shown, so it's always "now" and needs no new search
+st.radio("Opening hours", list(HOURS_MODES), format_func=HOURS_MODES.get, key="hours", horizontal=True,
+         label_visibility="collapsed")
+
 col1, col2, col3 = st.columns([2, 1, 2])
 with col2:
     search_btn = st.button("🔎 Search Now", use_container_width=True)
@@ -504,132 +173,196 @@ st.markdown('</div>', unsafe_allow_html=True)
 # Session state
 if 'show_all' not in st.session_state:
     st.session_state.show_all = {}
+if 'search' not in st.session_state:
+    st.session_state.search = None
+
+def hours_view(batch):
+    # The rows as the opening hours choice shows them
+    hours = st.session_state.get('hours', 'any')
+    if hours == 'only':
+        return batch.open_only()
+    if hours == 'first':
+        return batch.open_first()
+    return batch
+
+def render_stats(placeholder, batches):
+    # Counts what the cards show, so "Open now only" counts only what's open
+    shown = [b for b in map(hours_view, batches.values()) if len(b)]
+    nearest = min((b.nearest_km() for b in shown), default=None)
+    placeholder.markdown(f"""
+        <div class="stats-grid">
+            <div class="stat-card">
+                <div class="stat-num">{sum(len(b) for b in shown)}</div>
+                <div class="stat-label">Total Results</div>
+            </div>
+            <div class="stat-card">
+                <div class="stat-num">{len(shown)}</div>
+                <div class="stat-label">Service Types</div>
+            </div>
+            <div class="stat-card">
+                <div class="stat-num">{"–" if nearest is None else nearest}</div>
+                <div class="stat-label">Nearest (km)</div>
+            </div>
+        </div>
+    """, unsafe_allow_html=True)
+
+def toggle_show_all(stype):
+    st.session_state.show_all[stype] = not st.session_state.show_all.get(stype, False)
+
+@st.fragment
+def render_type(stype):
+    # Runs on its own when its button is clicked; the rest of the page is left alone
+    batch = hours_view(st.session_state.search['types'][stype])
+    total = len(batch)
+    expanded = st.session_state.show_all.get(stype, False)
+    
+    st.markdown(f'<div class="type-title">{stype} <span class="count">{total}</span></div>', unsafe_allow_html=True)
+    if not total:
+        st.caption("None known to be open now")
+        return
+    # Card markup and links only for the rows on screen
+    shown = batch.take(slice(None if expanded else 3))
+    st.markdown("".join(card_html(shown.records(), shown.open_at())), unsafe_allow_html=True)
+    
+    if total > 3:
+        col1, col2, col3 = st.columns([2, 1, 2])
+        with col2:
+            if not expanded:
+                st.button(f"Show all {total}", key=f"s_{stype}", use_container_width=True,
+                          on_click=toggle_show_all, args=(stype,))
+            else:
+                st.button(f"Show less", key=f"h_{stype}", use_container_width=True,
+                          on_click=toggle_show_all, args=(stype,))
+
+def finish_search(view):
+    # Everything derived from the results is computed once per search
+    results = view['results'] = ResultSet.concat(view['types'].values()).sorted()
+    # Two threads importing folium at once can see it partially initialized
+    preload_modules().join()
+    with span("map", markers=len(results)):
+        view['map_html'] = map_html(results, view['user_loc'], view['radius_km'], MAP_CLUSTER_THRESHOLD)
+
+def export_data(view, fmt):
+    # Generated only when its download button is clicked
+    def generate():
+        with span("export", format=fmt):
+            return export_bytes(view['results'], fmt, view['place'])
+    return generate
+
+def render_rest(view):
+    # Map
+    st.markdown('<div class="section-header">🗺️ Interactive Map</div>', unsafe_allow_html=True)
+    st.iframe(view['map_html'], width=1200, height=510)
+    
+    # Download
+    st.markdown('<div class="section-header">💾 Download Results</div>', unsafe_allow_html=True)
+    stamp = datetime.now().strftime('%Y%m%d_%H%M')
+    labels = {'csv': "📥 CSV", 'geojson': "🌐 GeoJSON", 'parquet': "📦 Parquet", 'txt': "📤 Text"}
+    for col, (fmt, (mime, ext)) in zip(st.columns(len(FORMATS)), FORMATS.items()):
+        with col:
+            st.download_button(labels[fmt], export_data(view, fmt), f"services_{stamp}.{ext}", mime,
+                               use_container_width=True, key=f"export_{fmt}")
+
+def render_debug(search_trace):
+    if not search_trace or not (DEBUG_PANEL or st.query_params.get("debug") == "1"):
+        return
+    total = max(search_trace['duration_ms'], 1)
+    rows = "".join(
+        f'<div style="display:flex;align-items:center;font-size:0.75rem;margin:2px 0;">'
+        f'<div style="width:180px;">{s["stage"]} {s.get("type", "")}</div>'
+        f'<div style="flex:1;position:relative;height:12px;background:#f1f5f9;">'
+        f'<div style="position:absolute;left:{100 * s["start_ms"] / total:.1f}%;width:{max(100 * s["duration_ms"] / total, 0.5):.1f}%;'
+        f'height:100%;background:{"#ef4444" if "error" in s else "#667eea"};"></div></div>'
+        f'<div style="width:80px;text-align:right;">{s["duration_ms"]} ms</div></div>'
+        for s in search_trace['spans']
+    )
+    with st.expander(f"🛠️ Search timings ({search_trace['duration_ms']} ms)"):
+        st.markdown(rows, unsafe_allow_html=True)
+        st.json(search_trace['counters'], expanded=False)
+        if prewarmer() is not None:
+            st.caption("Pre-warmed searches")
+            st.dataframe(prewarmer().status(), hide_index=True)
+
+def render_view(view):
+    st.success(f"✅ {view['address']}")
+    if not view['types']:
+        st.warning("⚠️ No results found. Try increasing radius or selecting more services.")
+        return
+    render_stats(st.empty(), view['types'])
+    st.markdown('<div class="section-header">📋 Search Results</div>', unsafe_allow_html=True)
+    for stype in view['types']:
+        render_type(stype)
+    render_rest(view)
+    render_debug(view.get('trace'))
 
 # Results
+view = st.session_state.search
+if view is not None and view['results'] is None:
+    # A search interrupted while results were streaming in (a click, a rerun, an error) never finished
+    view = st.session_state.search = None
+search_key = (normalize_query(place_name), radius_km, tuple(resource_filter))
+
+if search_btn and view and view['key'] == search_key and time.time() - view['created'] < RESULT_TTL:
+    # Same search again: reuse the processed view
+    search_btn = False
+
 if search_btn:
     if not place_name.strip():
         st.error("⚠️ Please enter a location")
     elif not resource_filter:
         st.error("⚠️ Please select at least one service")
     else:
-        with st.spinner("📍 Finding location..."):
-            location = geocode_location(place_name)
+        with trace("app", place=normalize_query(place_name), radius_km=radius_km, types=resource_filter) as search_trace:
+            with st.spinner("📍 Finding location..."):
+                try:
+                    location = geocode_location(place_name)
+                except FetchError:
+                    # Nominatim failed; unlike a miss, trying again may work
+                    location = False
         
-        if not location:
-            st.error("❌ Location not found. Try: 'Area, City'")
-        else:
-            user_loc = (location.latitude, location.longitude)
-            st.success(f"✅ {location.address}")
+            if location is False:
+                st.error("❌ Location lookup is unavailable right now. Please try again shortly.")
+            elif not location:
+                st.error("❌ Location not found. Try: 'Area, City'")
+            else:
+                user_loc = (location.latitude, location.longitude)
+                st.success(f"✅ {location.address}")
             
-            with st.spinner("🔄 Searching for services..."):
-                all_results = fetch_resources(location.latitude, location.longitude, radius_km, resource_filter)
+                view = st.session_state.search = {
+                    'key': search_key, 'created': time.time(), 'place': place_name, 'address': location.address,
+                    'user_loc': user_loc, 'radius_km': 0 if radius_km == NEAREST else radius_km, 'types': {},
+                    'results': None
+                }
+                stats = st.empty()
+                cards = st.container()
             
-            if not all_results:
-                st.warning("⚠️ No results found. Try increasing radius or selecting more services.")
-            else:
-                df = pd.DataFrame(all_results)
-                df = df.sort_values(by='Distance_km').reset_index(drop=True)
-                
-                # Modern Stats
-                st.markdown(f"""
-                    <div class="stats-grid">
-                        <div class="stat-card">
-                            <div class="stat-num">{len(df)}</div>
-                            <div class="stat-label">Total Results</div>
-                        </div>
-                        <div class="stat-card">
-                            <div class="stat-num">{len(df['Type'].unique())}</div>
-                            <div class="stat-label">Service Types</div>
-                        </div>
-                        <div class="stat-card">
-                            <div class="stat-num">{df.iloc[0]['Distance_km']}</div>
-                            <div class="stat-label">Nearest (km)</div>
-                        </div>
-                    </div>
-                """, unsafe_allow_html=True)
-                
-                # Results
-                st.markdown('<div class="section-header">📋 Search Results</div>', unsafe_allow_html=True)
-                
-                for stype in df['Type'].unique():
-                    type_df = df[df['Type'] == stype]
-                    total = len(type_df)
-                    
-                    st.markdown(f'<div class="type-title">{stype} <span class="count">{total}</span></div>', unsafe_allow_html=True)
-                    
-                    show = 3 if not st.session_state.show_all.get(stype, False) else total
-                    display_df = type_df.head(show)
-                    
-                    for idx, row in display_df.iterrows():
-                        st.markdown(f"""
-                        <div class="result-card">
-                            <div class="result-top">
-                                <div class="result-name">{row['Name']}</div>
-                                <div class="result-badge">{row['Distance_km']} km</div>
-                            </div>
-                            <div class="result-detail"><strong>📍</strong> {row['Address']}</div>
-                            <div class="result-detail"><strong>📞</strong> {row['Phone']}</div>
-                            <div class="result-detail"><strong>🕒</strong> {row['Hours']}</div>
-                            <div class="result-actions">
-                                <a href="{row['Google_Maps']}" target="_blank" class="btn-modern btn-green">🗺️ View Map</a>
-                                <a href="{row['Directions']}" target="_blank" class="btn-modern btn-blue">🧭 Directions</a>
-                            </div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    
-                    if total > 3:
-                        col1, col2, col3 = st.columns([2, 1, 2])
-                        with col2:
-                            if not st.session_state.show_all.get(stype, False):
-                                if st.button(f"Show all {total}", key=f"s_{stype}", use_container_width=True):
-                                    st.session_state.show_all[stype] = True
-                                    st.rerun()
-                            else:
-                                if st.button(f"Show less", key=f"h_{stype}", use_container_width=True):
-                                    st.session_state.show_all[stype] = False
-                                    st.rerun()
-                
-                # Map
-                st.markdown('<div class="section-header">🗺️ Interactive Map</div>', unsafe_allow_html=True)
-                
-                m = folium.Map(location=user_loc, zoom_start=13)
-                folium.Marker(user_loc, popup="Your Location", icon=folium.Icon(color='red', icon='star', prefix='fa')).add_to(m)
-                
-                colors = {'Hospital': 'blue', 'Clinic': 'lightblue', 'Doctors': 'purple',
-                         'Pharmacy': 'green', 'Police Station': 'darkblue', 'Fire Station': 'orange',
-                         'ATM': 'gray', 'Embassy': 'pink', 'Tourist Office': 'lightgreen'}
-                
-                for _, row in df.iterrows():
-                    popup = f"""<div style="width:220px;font-family:Inter;">
-                        <h4 style="margin:0 0 8px 0;">{row['Name']}</h4>
-                        <p style="margin:3px 0;font-size:0.85rem;"><b>Type:</b> {row['Type']}</p>
-                        <p style="margin:3px 0;font-size:0.85rem;"><b>Distance:</b> {row['Distance_km']} km</p>
-                        <p style="margin:3px 0;font-size:0.85rem;"><b>Phone:</b> {row['Phone']}</p>
-                        <div style="margin-top:10px;">
-                            <a href="{row['Google_Maps']}" target="_blank" 
-                               style="background:#10b981;color:white;padding:6px 12px;text-decoration:none;
-                                      border-radius:6px;margin-right:5px;display:inline-block;font-size:0.8rem;">Map</a>
-                            <a href="{row['Directions']}" target="_blank" 
-                               style="background:#3b82f6;color:white;padding:6px 12px;text-decoration:none;
-                                      border-radius:6px;display:inline-block;font-size:0.8rem;">Directions</a>
-                        </div>
-                    </div>"""
-                    folium.Marker([row['Latitude'], row['Longitude']], popup=folium.Popup(popup, max_width=250),
-                                 tooltip=f"{row['Name']} ({row['Distance_km']} km)",
-                                 icon=folium.Icon(color=colors.get(row['Type'], 'gray'), icon='info-sign')).add_to(m)
-                
-                folium.Circle(user_loc, radius=radius_km*1000, color='#667eea', fill=True, fillOpacity=0.1).add_to(m)
-                folium_static(m, width=1200, height=500)
-                
-                # Download
-                st.markdown('<div class="section-header">💾 Download Results</div>', unsafe_allow_html=True)
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    csv = df.to_csv(index=False)
-                    st.download_button("📥 CSV", csv, f"services_{datetime.now().strftime('%Y%m%d_%H%M')}.csv", "text/csv", use_container_width=True)
-                with col2:
-                    txt = f"Services near {place_name}\n\n" + "\n".join([f"{i+1}. {r['Name']} ({r['Type']}) - {r['Distance_km']} km\n   {r['Phone']}\n   {r['Google_Maps']}" for i, r in df.head(30).iterrows()])
-                    st.download_button("📤 Text", txt, f"services_{datetime.now().strftime('%Y%m%d')}.txt", "text/plain", use_container_width=True)
+                # Cards and stats fill in as each service type arrives
+                for stype, batch, searched_km in stream_resources(location.latitude, location.longitude, radius_km,
+                                                                  resource_filter):
+                    # The map circle shows the furthest any service had to be searched
+                    view['radius_km'] = max(view['radius_km'], searched_km)
+                    if not len(batch):
+                        continue
+                    if not view['types']:
+                        cards.markdown('<div class="section-header">📋 Search Results</div>', unsafe_allow_html=True)
+                    view['types'][stype] = batch
+                    render_stats(stats, view['types'])
+                    with cards, span("cards", type=stype):
+                        render_type(stype)
+            
+                if not view['types']:
+                    view['results'] = ResultSet.empty(user_loc)
+                    st.warning("⚠️ No results found. Try increasing radius or selecting more services.")
+                else:
+                    finish_search(view)
+                    render_rest(view)
+        if location:
+            view['trace'] = search_trace.to_dict()
+            render_debug(view['trace'])
+elif view:
+    render_view(view)
 
 # Footer
 st.markdown('<div class="footer">🚨 Emergency Services Finder - India | Data: OpenStreetMap | For emergencies dial helpline numbers above</div>', unsafe_allow_html=True)
+
+preload_modules()
@@ -0,0 +1,226 @@
+"""Nearest services for a list of sites, from a CSV of place names or coordinates.
+
+    python batch_search.py sites.csv -o nearest.csv --types "Hospital,Police Station" --radius 10
+    python batch_search.py sites.csv -o nearest_parquet/ --format parquet --workers 8
+
+The input needs a `place` column or `lat`/`lon` columns; an `id` column is
+used as the site id when present (otherwise the row number). Identical place
+names are geocoded once, and sites within --snap-m metres of each other share
+a single upstream search. Results are written as they complete, and finished
+sites are recorded in a checkpoint so an interrupted run picks up where it
+stopped (rerun the same command). Upstream rate limits are those of the
+search core (Nominatim 1 req/s, OVERPASS_RATE).
+"""
+import argparse
+import csv
+import math
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from geo import haversine_km
+from geocode_cache import normalize_query
+from metrics import trace
+from overpass import SERVICE_TAGS
+from results import ResultSet
+from search_core import SearchCore
+
+FIELDS = ['site_id', 'input', 'site_lat', 'site_lon', 'status', 'Type', 'Rank',
+          'Name', 'Distance_km', 'Address', 'Phone', 'Hours', 'Latitude', 'Longitude']
+
+
+class Checkpoint:
+    """Site ids already written to the output, kept in a small SQLite file."""
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.execute("CREATE TABLE IF NOT EXISTS done (site_id TEXT PRIMARY KEY, finished REAL)")
+
+    def done(self):
+        return {row[0] for row in self.db.execute("SELECT site_id FROM done")}
+
+    def mark(self, site_ids):
+        now = time.time()
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO done VALUES (?, ?)", [(s, now) for s in site_ids])
+
+
+class CsvSink:
+    def __init__(self, path):
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.f = open(path, 'a', newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.f, fieldnames=FIELDS)
+        if new:
+            self.writer.writeheader()
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+        self.f.flush()
+        os.fsync(self.f.fileno())
+
+    def close(self):
+        self.f.close()
+
+
+class ParquetSink:
+    """Writes a directory of part files, so a resumed run just adds parts."""
+
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            sys.exit("Parquet output needs pyarrow: pip install pyarrow")
+        self.pa, self.pq = pa, pq
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.part = len([f for f in os.listdir(path) if f.endswith('.parquet')])
+
+    def write(self, rows):
+        if not rows:
+            return
+        table = self.pa.Table.from_pylist([{k: row.get(k) for k in FIELDS} for row in rows])
+        self.pq.write_table(table, os.path.join(self.path, f"part-{self.part:05d}.parquet"))
+        self.part += 1
+
+    def close(self):
+        pass
+
+
+def read_sites(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for n, row in enumerate(csv.DictReader(f), start=1):
+            site_id = (row.get('id') or '').strip() or str(n)
+            if (row.get('lat') or '').strip() and (row.get('lon') or '').strip():
+                yield {'site_id': site_id, 'input': f"{row['lat']},{row['lon']}",
+                       'lat': float(row['lat']), 'lon': float(row['lon'])}
+            elif (row.get('place') or '').strip():
+                yield {'site_id': site_id, 'input': row['place'].strip()}
+
+
+def group_sites(sites, snap_m):
+    """Bucket sites that can share one search: same normalized place, or the same snap cell."""
+    groups = {}
+    for site in sites:
+        if 'lat' in site:
+            step = snap_m / 111_320
+            lat_cell = math.floor(site['lat'] / step)
+            lon_step = step / max(math.cos(math.radians(site['lat'])), 1e-6)
+            key = ('cell', lat_cell, math.floor(site['lon'] / lon_step))
+        else:
+            key = ('place', normalize_query(site['input']))
+        groups.setdefault(key, []).append(site)
+    return list(groups.values())
+
+
+def site_rows(site, results, lat, lon, radius_km, per_type):
+    """Re-rank shared results from this site's own coordinates."""
+    base = {'site_id': site['site_id'], 'input': site['input'], 'site_lat': lat, 'site_lon': lon}
+    rows, counts = [], {}
+    for r in results.recentred((lat, lon)).ranked(radius_km, per_type):
+        counts[r['Type']] = counts.get(r['Type'], 0) + 1
+        del r['Google_Maps'], r['Directions']
+        rows.append(dict(base, status='ok', Rank=counts[r['Type']], **r))
+    return rows or [dict(base, status='no_results')]
+
+
+def search_group(core, group, radius_km, types, per_type):
+    with trace("batch", sites=[s['site_id'] for s in group]):
+        return _search_group(core, group, radius_km, types, per_type)
+
+
+def _search_group(core, group, radius_km, types, per_type):
+    first = group[0]
+    if 'lat' in first:
+        coords = [(s['lat'], s['lon']) for s in group]
+    else:
+        location = core.geocode_location(first['input'])
+        if location is None:
+            return [dict(site_id=s['site_id'], input=s['input'], status='not_found') for s in group]
+        coords = [(location.latitude, location.longitude)] * len(group)
+
+    # One search around the group's centre, widened to cover every member
+    lat = sum(c[0] for c in coords) / len(coords)
+    lon = sum(c[1] for c in coords) / len(coords)
+    margin = max(float(haversine_km(lat, lon, c[0], c[1])) for c in coords) if len(group) > 1 else 0
+    errors = []
+    results = ResultSet.concat(batch for _, batch in core.stream_resources(
+        round(lat, 5), round(lon, 5), radius_km + math.ceil(margin * 100) / 100, types,
+        on_error=lambda r_type, e: errors.append(e)))
+    if errors:
+        # Partial results are not checkpointed; the group is retried on the next run
+        raise errors[0]
+    return [row for s, (slat, slon) in zip(group, coords)
+            for row in site_rows(s, results, slat, slon, radius_km, per_type)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch nearest-service search over a CSV of sites.")
+    parser.add_argument("input", help="CSV with a place column or lat/lon columns (optional id column)")
+    parser.add_argument("-o", "--output", required=True, help="output CSV file, or directory for --format parquet")
+    parser.add_argument("--format", choices=['csv', 'parquet'], default=None, help="default: from the output name")
+    parser.add_argument("--types", default="Hospital,Police Station", help="comma-separated service types")
+    parser.add_argument("--radius", type=float, default=10, help="search radius in km")
+    parser.add_argument("--per-type", type=int, default=3, help="nearest results kept per type and site")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent searches")
+    parser.add_argument("--snap-m", type=float, default=250, help="sites this close share one search")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument("--flush-every", type=int, default=50, help="sites per output flush")
+    args = parser.parse_args(argv)
+
+    types = [t.strip() for t in args.types.split(',') if t.strip()]
+    unknown = [t for t in types if t not in SERVICE_TAGS]
+    if unknown:
+        parser.error(f"unknown types: {', '.join(unknown)}")
+
+    fmt = args.format or ('csv' if args.output.endswith('.csv') else 'parquet')
+    sink = CsvSink(args.output) if fmt == 'csv' else ParquetSink(args.output)
+    checkpoint = Checkpoint(args.checkpoint or args.output.rstrip('/') + '.checkpoint')
+
+    done = checkpoint.done()
+    sites = [s for s in read_sites(args.input) if s['site_id'] not in done]
+    groups = group_sites(sites, args.snap_m)
+    print(f"{len(done)} sites already done, {len(sites)} to go in {len(groups)} searches", file=sys.stderr)
+
+    core = SearchCore()
+    pending_rows, pending_ids, finished = [], [], 0
+    start = time.perf_counter()
+
+    def flush():
+        # Output first, then checkpoint: a crash in between repeats rows rather than losing them
+        sink.write(pending_rows)
+        checkpoint.mark(pending_ids)
+        pending_rows.clear()
+        pending_ids.clear()
+
+    pool = ThreadPoolExecutor(max_workers=args.workers)
+    try:
+        futures = {pool.submit(search_group, core, g, args.radius, types, args.per_type): g for g in groups}
+        for future in as_completed(futures):
+            group = futures[future]
+            try:
+                rows = future.result()
+            except Exception as e:
+                # Left out of the checkpoint so the next run retries it
+                print(f"failed {[s['site_id'] for s in group]}: {e!r}", file=sys.stderr)
+                continue
+            pending_rows.extend(rows)
+            pending_ids.extend(s['site_id'] for s in group)
+            finished += len(group)
+            if len(pending_ids) >= args.flush_every:
+                flush()
+                rate = finished / (time.perf_counter() - start)
+                print(f"{finished}/{len(sites)} sites ({rate:.1f}/s)", file=sys.stderr)
+    finally:
+        # On an interrupt, searches not started yet are dropped rather than run for nothing;
+        # only those already running (at most --workers) are waited for
+        pool.shutdown(cancel_futures=True)
+        flush()
+        sink.close()
+    print(f"done: {finished}/{len(sites)} sites in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Per-element geodesic vs batched haversine on synthetic POIs.
+
+    python benchmarks/bench_distance.py [n_points]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+from geopy.distance import geodesic
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from geo import haversine_km  # noqa: E402
+
+
+def main(n=10_000):
+    rng = np.random.default_rng(0)
+    lat, lon = 28.6315, 77.2167
+    lats = lat + rng.uniform(-0.3, 0.3, n)
+    lons = lon + rng.uniform(-0.3, 0.3, n)
+
+    start = time.perf_counter()
+    exact = np.array([geodesic((lat, lon), (a, b)).km for a, b in zip(lats, lons)])
+    t_geodesic = time.perf_counter() - start
+
+    start = time.perf_counter()
+    approx = haversine_km(lat, lon, lats, lons)
+    t_haversine = time.perf_counter() - start
+
+    err = np.abs(approx - exact) / np.maximum(exact, 1e-9)
+    print(f"points:     {n}")
+    print(f"geodesic:   {t_geodesic * 1000:9.2f} ms")
+    print(f"haversine:  {t_haversine * 1000:9.2f} ms  ({t_geodesic / t_haversine:.0f}x faster)")
+    print(f"max rel err {err.max():.4%}, max abs err {np.abs(approx - exact).max() * 1000:.1f} m")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
@@ -0,0 +1,151 @@
+"""opening_hours compile and "open now" evaluation cost.
+
+    python benchmarks/bench_hours.py                      # recorded fixtures, else the sample strings
+    python benchmarks/bench_hours.py --scale 10000 100000
+    python benchmarks/bench_hours.py hours.txt            # one opening_hours value per line
+
+Real values can be pulled from an Overpass dump of the area, e.g.
+`[out:csv(opening_hours;false)]; nwr[amenity~"hospital|clinic|pharmacy|doctors"][opening_hours](area); out;`.
+First checks the evaluator against known answers (exiting on a mismatch),
+then reports how many distinct strings (and rows) are understood, the cold
+compile time per distinct string, and `ResultSet.open_at` over result sets
+whose Hours are drawn from those strings, against compiling row by row.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fixtures import LOCATIONS, fixture_path, load  # noqa: E402
+from opening_hours import CLOSED, OPEN, UNKNOWN, compile_hours, minute_of_week, status_at  # noqa: E402
+from results import ResultSet  # noqa: E402
+
+# Frequent shapes of opening_hours on Indian hospitals, clinics and pharmacies, with rough weights
+SAMPLE_HOURS = {
+    "24/7": 40, "Mo-Sa 09:00-21:00": 12, "Mo-Su 09:00-21:00": 8, "Mo-Sa 10:00-20:00": 6,
+    "Mo-Sa 09:00-13:00,17:00-21:00": 6, "Mo-Sa 10:00-14:00,17:00-21:00; Su off": 4,
+    "Mo-Fr 09:00-17:00; Sa 09:00-13:00": 4, "Mo-Sa 08:00-22:00; Su 09:00-13:00": 3, "Mo-Su 00:00-24:00": 3,
+    "Mo-Sa 09:00-20:00; Su,PH off": 3, "Mo-Sa 09:30-13:30, 17:30-21:00": 2, "Mo-Fr 09:00-16:00": 2,
+    "Mo-Sa 18:00-22:00": 2, "Mo-Su 07:00-23:00": 2, "Mo-Sa 10:00-13:00; Tu off": 1, "Tu-Su 10:00-19:00": 1,
+    "Mo-Su 08:00-02:00": 1, "09:00-21:00": 2, "Mo-Sa 09:00-21:00; Su 10:00-14:00; PH off": 1,
+    "Mo-Fr 08:00-20:00; Sa,Su 09:00-14:00": 1, "mo-sa 10:00-21:00": 1, "Mo-Sa 9:00-21:00": 1,
+    "Mo-Sa 09:00-21:00 \"emergency 24 hours\"": 1, "sunrise-sunset": 1, "Mo-Sa 09:00+": 1, "9am-9pm": 1,
+    "Jan-Dec Mo-Sa 10:00-18:00": 1, "24 hours": 1,
+}
+
+# (opening_hours, local time, expected status); 2026-01-05 is a Monday
+CHECKS = [
+    ("24/7", "2026-01-06T03:00", OPEN),
+    ("Mo-Sa 09:00-21:00; Su off", "2026-01-05T08:59", CLOSED),
+    ("Mo-Sa 09:00-21:00; Su off", "2026-01-11T12:00", CLOSED),
+    ("Mo-Fr 09:00-13:00,14:00-18:00", "2026-01-06T13:30", CLOSED),
+    ("Mo-Fr 09:00-18:00, Sa 10:00-14:00", "2026-01-10T11:00", OPEN),
+    ("Mo-Sa 10:00-20:00; Sa 10:00-14:00", "2026-01-10T15:00", CLOSED),
+    # Spans past midnight carry into the next day, on consecutive days too
+    *(("Mo-Su 08:00-02:00", f"2026-01-{d:02}T01:00", OPEN) for d in range(5, 12)),
+    *(("18:00-03:00", f"2026-01-{d:02}T01:00", OPEN) for d in range(5, 12)),
+    *(("Mo-Fr 22:00-02:00", f"2026-01-{d:02}T01:00", OPEN) for d in range(6, 11)),
+    ("Mo-Fr 22:00-02:00", "2026-01-05T01:00", CLOSED),
+    ("Mo-Fr 22:00-02:00", "2026-01-11T01:00", CLOSED),
+    ("Fr-Mo 22:00-02:00", "2026-01-06T01:00", OPEN),
+    # An overriding rule replaces its own days' hours, not the spill from the day before
+    ("Mo 22:00-02:00; Tu 10:00-12:00", "2026-01-06T01:00", OPEN),
+    ("Mo-Su 08:00-02:00; Tu off", "2026-01-06T01:00", OPEN),
+    ("Mo-Su 08:00-02:00; Tu off", "2026-01-07T01:00", CLOSED),
+    # Holiday rules are skipped; with nothing else, the hours are unknown rather than never open
+    ("PH off", "2026-01-05T10:00", UNKNOWN),
+    ("Mo-Fr 09:00-17:00; PH off", "2026-01-05T10:00", OPEN),
+    ("Jan-Mar Mo-Fr 09:00-17:00", "2026-01-05T10:00", UNKNOWN),
+    ("9am-9pm", "2026-01-05T10:00", UNKNOWN),
+]
+
+
+def check():
+    failures = [(text, at, expected, got) for text, at, expected in CHECKS
+                if (got := status_at([text], datetime.fromisoformat(at))[0]) != expected]
+    for text, at, expected, got in failures:
+        print(f"FAIL {text!r} at {at}: {got}, expected {expected}")
+    if failures:
+        sys.exit(1)
+    print(f"{len(CHECKS)} checks passed")
+
+
+def recorded_hours():
+    counts = Counter()
+    for name in LOCATIONS:
+        if os.path.exists(fixture_path(name)):
+            fixture, _ = load(name)
+            counts.update(e['tags']['opening_hours'] for e in fixture['elements']
+                          if 'opening_hours' in e.get('tags', {}))
+    return counts
+
+
+def hours_counts(args):
+    """({opening_hours string: count}, source name)."""
+    if args.strings:
+        with open(args.strings, encoding='utf-8') as f:
+            return Counter(line.strip() for line in f if line.strip()), os.path.basename(args.strings)
+    counts = recorded_hours()
+    if counts:
+        return counts, "recorded fixtures"
+    return Counter(SAMPLE_HOURS), "sample strings"
+
+
+def result_set(counts, n, seed=0):
+    rng = random.Random(seed)
+    hours = rng.choices(list(counts), weights=list(counts.values()), k=n)
+    # About a third of facilities have no opening_hours at all
+    rows = (("Pharmacy", f"Facility {i}", "N/A", "N/A", h if rng.random() < 0.7 else "N/A", 28.6, 77.2)
+            for i, h in enumerate(hours))
+    return ResultSet.from_rows((28.6, 77.2), rows, [0.0] * n)
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="opening_hours parsing and evaluation benchmarks.")
+    parser.add_argument("strings", nargs="?", help="file of opening_hours values, one per line")
+    parser.add_argument("--scale", nargs="*", type=int, default=[1000, 10000, 100000], help="result set sizes")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    check()
+    counts, source = hours_counts(args)
+    compile_hours.cache_clear()
+    start = time.perf_counter()
+    masks = {text: compile_hours(text) for text in counts}
+    compile_ms = (time.perf_counter() - start) * 1000
+    understood = [text for text, mask in masks.items() if mask is not None]
+    rows = sum(counts.values())
+    print(f"{source}: {len(counts)} distinct strings over {rows} uses")
+    print(f"understood: {len(understood)} distinct ({len(understood) / len(counts):.0%}), "
+          f"{sum(counts[t] for t in understood) / rows:.0%} of uses")
+    print(f"cold compile: {compile_ms:.2f} ms total, {compile_ms * 1000 / len(counts):.0f} us per string")
+    for text in sorted(set(counts) - set(understood), key=counts.get, reverse=True)[:10]:
+        print(f"  unknown: {text!r} x{counts[text]}")
+
+    when = datetime(2026, 1, 5, 22, 30)
+    minute = minute_of_week(when)
+    print(f"\n{'rows':>8} {'open_at ms':>11} {'per row ms':>11} {'speed-up':>9}")
+    for n in args.scale:
+        results = result_set(counts, n)
+        hours = [results.strings[c] for c in results.text[:, 3]]
+        batched = timed(lambda: results.open_at(when), args.repeat)
+        # Parsing every row's string, as a per-card evaluation without the cache would
+        per_row = timed(lambda: [m is not None and m[minute] for m in map(compile_hours.__wrapped__, hours)], 1)
+        print(f"{n:>8} {batched:>11.2f} {per_row:>11.1f} {per_row / batched:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
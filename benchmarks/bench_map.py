@@ -0,0 +1,42 @@
+"""Generated map HTML size and render time, per-marker vs clustered.
+
+    python benchmarks/bench_map.py [n_markers ...]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from map_render import TYPE_COLORS, build_map  # noqa: E402
+from results import ResultSet  # noqa: E402
+
+
+def synthetic_records(n, lat=28.6315, lon=77.2167, seed=0):
+    rng = random.Random(seed)
+    types = list(TYPE_COLORS)
+    return ResultSet.from_rows((lat, lon), (
+        (rng.choice(types), f"Facility {i}", 'Connaught Place, New Delhi', '011-23456789', '24/7',
+         lat + rng.uniform(-0.2, 0.2), lon + rng.uniform(-0.2, 0.2))
+        for i in range(n)
+    ))
+
+
+def measure(records, threshold):
+    start = time.perf_counter()
+    m = build_map(records, (28.6315, 77.2167), 20, cluster_threshold=threshold)
+    page = m.get_root().render()
+    return time.perf_counter() - start, len(page.encode())
+
+
+def main(sizes):
+    print(f"{'markers':>8} {'mode':>10} {'render ms':>10} {'html KB':>9}")
+    for n in sizes:
+        records = synthetic_records(n)
+        for mode, threshold in [('markers', float('inf')), ('clustered', 0)]:
+            elapsed, size = measure(records, threshold)
+            print(f"{n:>8} {mode:>10} {elapsed * 1000:>10.1f} {size / 1024:>9.1f}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [100, 1000, 5000])
@@ -0,0 +1,131 @@
+"""Parse time and peak memory per Overpass response: whole-document JSON vs streamed.
+
+    python benchmarks/bench_parse.py                       # recorded fixtures, plus --scale sizes
+    python benchmarks/bench_parse.py --synthetic           # generated data for unrecorded fixtures
+    python benchmarks/bench_parse.py --scale 50000 200000
+    python benchmarks/bench_parse.py response.json ...      # raw responses saved from Overpass
+
+`json` is what the engine used to do (`res.json()`, every element kept in
+full), `stream` the incremental parser fed 64 KB at a time keeping only the
+needed fields, and `csv` the same elements requested with OVERPASS_OUTPUT=csv.
+Fixture elements carry only a few tags, so they are padded with the bulk real
+responses have (way node lists and unrelated tags) unless --no-padding is
+given. Peak memory is measured with tracemalloc and includes the parsed result.
+"""
+import argparse
+import codecs
+import gzip
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fixtures import LOCATIONS, load, synthetic_elements  # noqa: E402
+from overpass import KEEP_TAGS, CSVElements, JSONElements  # noqa: E402
+
+CHUNK = 64 * 1024
+
+EXTRA_TAGS = {'building': "yes", 'healthcare': "hospital", 'source': "survey;bing", 'wikidata': "Q1234567",
+              'check_date': "2024-05-01", 'wheelchair': "limited", 'emergency': "yes", 'operator:type': "public",
+              'website': "https://example.org/facility", 'name:hi': "अस्पताल"}
+
+
+def padded(elements, seed=0):
+    rng = random.Random(seed)
+    out = []
+    for elem in elements:
+        elem = {**elem, 'tags': {**EXTRA_TAGS, **elem.get('tags', {})}}
+        if elem['type'] != 'node':
+            elem['nodes'] = [rng.randint(10 ** 9, 10 ** 10) for _ in range(rng.randint(5, 60))]
+        out.append(elem)
+    return out
+
+
+def json_body(elements):
+    return json.dumps({'version': 0.6, 'generator': "Overpass API", 'osm3s': {'copyright': "ODbL"},
+                       'elements': elements}, ensure_ascii=False).encode()
+
+
+def csv_body(elements):
+    rows = ["\t".join(["@type", "@id", "@lat", "@lon", *KEEP_TAGS])]
+    for elem in elements:
+        center = elem.get('center', elem)
+        tags = elem.get('tags', {})
+        rows.append("\t".join([elem['type'], str(elem['id']), str(center['lat']), str(center['lon'])] +
+                              [tags.get(k, '').replace('\t', ' ').replace('\n', ' ') for k in KEEP_TAGS]))
+    return ("\n".join(rows) + "\n").encode()
+
+
+def parse_whole(body):
+    return json.loads(body).get('elements', [])
+
+
+def parse_stream(body, parser_class=JSONElements):
+    # Fed and decoded chunk by chunk, as the engine does with a streamed response
+    parser = parser_class()
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    elements = []
+    for start in range(0, len(body), CHUNK):
+        elements.extend(parser.feed(decoder.decode(body[start:start + CHUNK])))
+    elements.extend(parser.feed(decoder.decode(b'', final=True)))
+    parser.close()
+    return elements
+
+
+def measure(parse, body, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse(body)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    parse(body)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times) * 1000, peak / 2 ** 20
+
+
+def responses(args):
+    """(name, elements or None, raw JSON body or None)."""
+    for path in args.responses:
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rb') as f:
+            yield os.path.basename(path), None, f.read()
+    if args.responses:
+        return
+    for name in LOCATIONS:
+        fixture, source = load(name, args.synthetic)
+        yield f"{name} ({source})", fixture['elements'], None
+    for n in args.scale:
+        yield f"scale-{n}", synthetic_elements(28.6315, 77.2167, n), None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Overpass response parsing benchmarks.")
+    parser.add_argument("responses", nargs="*", help="raw Overpass JSON responses (.json or .json.gz)")
+    parser.add_argument("--scale", nargs="*", type=int, default=[50000], help="synthetic element counts")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-padding", action="store_true", help="parse fixture elements as they are")
+    parser.add_argument("--synthetic", action="store_true",
+                        help="generate data for fixtures that haven't been recorded (reported as synthetic)")
+    args = parser.parse_args(argv)
+
+    print(f"{'response':>20} {'elements':>8} {'mode':>6} {'body KB':>9} {'parse ms':>9} {'peak MB':>8}")
+    for name, elements, body in responses(args):
+        if body is None:
+            elements = elements if args.no_padding else padded(elements)
+            body = json_body(elements)
+        else:
+            elements = json.loads(body).get('elements', [])
+        modes = [('json', parse_whole, body), ('stream', parse_stream, body),
+                 ('csv', lambda b: parse_stream(b, CSVElements), csv_body(elements))]
+        for mode, parse, data in modes:
+            ms, peak = measure(parse, data, args.repeat)
+            print(f"{name:>20} {len(elements):>8} {mode:>6} {len(data) / 1024:>9.0f} {ms:>9.1f} {peak:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
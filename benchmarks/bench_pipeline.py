@@ -0,0 +1,175 @@
+"""Per-stage timings of the search pipeline on replayed fixtures, written as JSON.
+
+    python benchmarks/bench_pipeline.py                     # all fixtures x all radii
+    python benchmarks/bench_pipeline.py --synthetic         # generated data for unrecorded fixtures
+    python benchmarks/bench_pipeline.py --scale 10000 100000 # plus synthetic scale-up
+    python benchmarks/bench_pipeline.py --compare base.json new.json
+
+Stages are timed in isolation, each on the previous stage's output: parse
+(elements to records), distance, rank, dataframe (sort and group), cards and
+map. Nothing touches the network; see fixtures.py for recording real
+responses. Results go to benchmarks/results/<time>-<commit>.json unless -o
+is given.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import folium
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("GEOCODE_CACHE_PATH", os.path.join(tempfile.mkdtemp(), "geocode.sqlite3"))
+
+from cards import card_html  # noqa: E402
+from fixtures import LOCATIONS, RADII, load, synthetic_elements  # noqa: E402
+from geo import haversine_km  # noqa: E402
+from map_render import CLUSTER_THRESHOLD, map_html  # noqa: E402
+from overpass import SERVICE_TAGS, element_coords, element_fields, split_elements  # noqa: E402
+from results import ResultSet  # noqa: E402
+from search_core import SearchCore  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+TYPES = list(SERVICE_TAGS)
+
+
+def timed(fn, repeat):
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return result, {'median_ms': round(statistics.median(times), 3), 'min_ms': round(min(times), 3)}
+
+
+def within(elements, lat, lon, radius_km):
+    located = [(e, element_coords(e)) for e in elements]
+    located = [(e, c) for e, c in located if c is not None]
+    if not located:
+        return []
+    dists = haversine_km(lat, lon, [c[0] for _, c in located], [c[1] for _, c in located])
+    return [e for (e, _), d in zip(located, dists) if d <= radius_km]
+
+
+def run_stages(core, elements, lat, lon, radius_km, repeat, capped=True):
+    """Time every stage once per repeat; returns {stage: timings} and the result count."""
+    stages = {}
+
+    def parse():
+        fields = ((t, element_fields(e, t)) for t, e in split_elements(elements, TYPES))
+        return ResultSet.from_rows((lat, lon), ((t, *f) for t, f in fields if f))
+
+    records, stages['parse'] = timed(parse, repeat)
+    records, stages['distance'] = timed(records.measure, repeat)
+    if capped:
+        results, stages['rank'] = timed(lambda: core.rank_records(records, radius_km), repeat)
+    else:
+        # Scale-up runs skip the per-type cap so downstream stages see every record
+        results, stages['rank'] = timed(records.sorted, repeat)
+
+    def dataframe():
+        df = results.to_frame()
+        df.groupby('Type', observed=True).size()
+        return df
+
+    _, stages['dataframe'] = timed(dataframe, repeat)
+    by_type = {t: results.of_type(t) for t in results.type_names()}
+    _, stages['cards'] = timed(lambda: {t: card_html(rs.records()) for t, rs in by_type.items()}, repeat)
+    _, stages['map'] = timed(lambda: map_html(results, (lat, lon), radius_km, CLUSTER_THRESHOLD), repeat)
+    return stages, len(results)
+
+
+def commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench(args):
+    core = SearchCore()
+    rows = []
+    for name in args.fixtures:
+        fixture, source = load(name, args.synthetic)
+        hit = fixture['nominatim'][0]
+        lat, lon = float(hit['lat']), float(hit['lon'])
+        for radius_km in args.radii:
+            elements = within(fixture['elements'], lat, lon, radius_km)
+            stages, n_results = run_stages(core, elements, lat, lon, radius_km, args.repeat)
+            for stage, t in stages.items():
+                rows.append({'fixture': name, 'source': source, 'radius_km': radius_km, 'elements': len(elements),
+                             'results': n_results, 'stage': stage, **t})
+            print(f"{name:>6} {radius_km:>3} km {len(elements):>7} elements  "
+                  + "  ".join(f"{s} {t['median_ms']:.1f}" for s, t in stages.items()), file=sys.stderr)
+
+    _, lat, lon, _ = LOCATIONS['metro']
+    for n in args.scale:
+        elements = synthetic_elements(lat, lon, n, seed=n)
+        stages, n_results = run_stages(core, elements, lat, lon, max(RADII), min(args.repeat, 3), capped=False)
+        for stage, t in stages.items():
+            rows.append({'fixture': f"scale-{n}", 'source': "synthetic", 'radius_km': max(RADII), 'elements': n,
+                         'results': n_results, 'stage': stage, **t})
+        print(f"scale {n:>7} elements  " + "  ".join(f"{s} {t['median_ms']:.1f}" for s, t in stages.items()),
+              file=sys.stderr)
+
+    sha = commit()
+    report = {
+        'commit': sha, 'created': time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), 'repeat': args.repeat,
+        'python': platform.python_version(), 'machine': platform.machine(), 'platform': platform.platform(),
+        'versions': {'numpy': np.__version__, 'pandas': pd.__version__, 'folium': folium.__version__},
+        'results': rows,
+    }
+    out = args.output or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{sha or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=1)
+    print(out)
+
+
+def compare(base_path, new_path, threshold=1.2):
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    key = lambda r: (r['fixture'], r['radius_km'], r['stage'])  # noqa: E731
+    before = {key(r): r for r in base['results']}
+    print(f"{base['commit']} -> {new['commit']}")
+    print(f"{'fixture':>12} {'km':>3} {'stage':>13} {'base ms':>9} {'new ms':>9} {'ratio':>6}")
+    for r in new['results']:
+        old = before.get(key(r))
+        if old is None:
+            continue
+        ratio = r['median_ms'] / max(old['median_ms'], 1e-3)
+        flag = "  slower" if ratio > threshold else "  faster" if ratio < 1 / threshold else ""
+        print(f"{r['fixture']:>12} {r['radius_km']:>3} {r['stage']:>13} {old['median_ms']:>9.2f} "
+              f"{r['median_ms']:>9.2f} {ratio:>6.2f}{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search pipeline benchmarks on replayed fixtures.")
+    parser.add_argument("--fixtures", nargs="+", default=list(LOCATIONS), choices=list(LOCATIONS))
+    parser.add_argument("--radii", nargs="+", type=float, default=RADII)
+    parser.add_argument("--repeat", type=int, default=5, help="runs per stage; the median is reported")
+    parser.add_argument("--scale", nargs="*", type=int, default=[], help="synthetic POI counts, e.g. 10000 100000")
+    parser.add_argument("--synthetic", action="store_true",
+                        help="generate data for fixtures that haven't been recorded (reported as synthetic)")
+    parser.add_argument("-o", "--output", help="results file (default benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="compare two results files")
+    args = parser.parse_args(argv)
+    if args.compare:
+        compare(*args.compare)
+    else:
+        bench(args)
+
+
+if __name__ == "__main__":
+    main()
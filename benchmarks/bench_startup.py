@@ -0,0 +1,134 @@
+"""Cold start and rerun timings of the Streamlit app, written as JSON.
+
+    python benchmarks/bench_startup.py                  # 5 fresh processes
+    python benchmarks/bench_pipeline.py --compare base.json new.json
+
+Every sample runs in a fresh interpreter, like a newly scheduled replica:
+`import` is the time to import Streamlit, `first_run` the first script run
+(the app's own imports included) and `cold_start` the time from spawning the
+process until that first page is rendered. `rerun` and `results_rerun` time
+later script runs of the landing page and of a results page, searched against
+the local stub upstream. `server_ready` is how long `streamlit run` takes to
+answer its health check. Results are written next to the pipeline benchmarks
+and in the same format, so `bench_pipeline.py --compare` applies.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "app.py")
+STUB_PORT = 8799
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def child(reruns):
+    """Runs in the fresh interpreter; prints {stage: ms} plus the wall time the first page was done."""
+    start = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    imported = time.perf_counter()
+    at = AppTest.from_file(APP, default_timeout=120)
+    at.run()
+    first_run = time.perf_counter()
+    rendered_at = time.time()
+
+    def rerun():
+        t = time.perf_counter()
+        at.run()
+        return (time.perf_counter() - t) * 1000
+
+    landing = [rerun() for _ in range(reruns)]
+    at.text_input[0].input("Connaught Place Delhi")
+    at.button[0].click()
+    at.run()
+    results = [rerun() for _ in range(reruns)]
+    if at.exception:
+        raise SystemExit(f"app raised: {at.exception}")
+    print(json.dumps({'import': (imported - start) * 1000, 'first_run': (first_run - imported) * 1000,
+                      'rerun': statistics.median(landing), 'results_rerun': statistics.median(results),
+                      'rendered_at': rendered_at}))
+
+
+def sample(reruns, env):
+    spawned = time.time()
+    out = subprocess.run([sys.executable, __file__, "--child", "--reruns", str(reruns)], env=env, cwd=ROOT,
+                         capture_output=True, text=True, check=True).stdout
+    timings = json.loads(out.strip().splitlines()[-1])
+    timings['cold_start'] = (timings.pop('rendered_at') - spawned) * 1000
+    return timings
+
+
+def server_ready(env, timeout=60):
+    port = free_port()
+    spawned = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "streamlit", "run", APP, "--server.headless", "true",
+                             "--server.port", str(port)], env=env, cwd=ROOT,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - spawned < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as r:
+                    if r.status == 200:
+                        return (time.perf_counter() - spawned) * 1000
+            except OSError:
+                time.sleep(0.05)
+        raise SystemExit("streamlit did not become healthy")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Streamlit app cold start and rerun benchmarks.")
+    parser.add_argument("--samples", type=int, default=5, help="fresh processes; the median is reported")
+    parser.add_argument("--reruns", type=int, default=5, help="reruns timed per process")
+    parser.add_argument("-o", "--output", help="results file (default benchmarks/results/<time>-<commit>-startup.json)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        return child(args.reruns)
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from bench_pipeline import RESULTS_DIR, commit
+    from stub_server import serve
+
+    # Every sample starts with cold caches and searches against the local stub
+    server = serve(STUB_PORT)
+    tmp = tempfile.mkdtemp()
+    base_env = {**os.environ, 'OVERPASS_MIRRORS': f"http://127.0.0.1:{STUB_PORT}",
+                'NOMINATIM_URL': f"http://127.0.0.1:{STUB_PORT}/search"}
+    samples = []
+    for i in range(args.samples):
+        env = {**base_env, 'GEOCODE_CACHE_PATH': os.path.join(tmp, f"geocode-{i}.sqlite3")}
+        samples.append(sample(args.reruns, env))
+        samples[-1]['server_ready'] = server_ready(env)
+        print("  ".join(f"{k} {v:.0f}" for k, v in samples[-1].items()), file=sys.stderr)
+    server.shutdown()
+
+    rows = [{'fixture': "app", 'source': "stub", 'radius_km': 0, 'elements': None, 'results': None, 'stage': stage,
+             'median_ms': round(statistics.median(s[stage] for s in samples), 3),
+             'min_ms': round(min(s[stage] for s in samples), 3)} for stage in samples[0]]
+    sha = commit()
+    report = {'commit': sha, 'created': time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+              'samples': args.samples, 'reruns': args.reruns, 'python': sys.version.split()[0], 'results': rows}
+    out = args.output or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{sha or 'nogit'}-startup.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=1)
+    print(out)
+
+
+if __name__ == "__main__":
+    main()
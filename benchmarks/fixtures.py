@@ -0,0 +1,110 @@
+"""Recorded Nominatim/Overpass responses for the pipeline benchmarks.
+
+    python benchmarks/fixtures.py record [name ...]
+
+Each fixture holds the Nominatim hit for a representative place and every
+mapped service within the largest search radius around it, gzipped under
+benchmarks/fixtures/. Smaller radii are replayed by filtering on distance.
+Fixtures are committed, so every commit is measured on the same data; the
+files are written byte for byte the same for the same responses (elements
+in id order, no gzip timestamp), so a re-record only shows up in a diff when
+the data changed.
+A fixture that has not been recorded is an error unless synthetic data is
+asked for (--synthetic in the benchmarks): POIs generated with a density
+matching the kind of place, reported as "synthetic" rather than a replay.
+"""
+import gzip
+import json
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fetch_engine import FetchEngine  # noqa: E402
+from overpass import OVERPASS_URL, SERVICE_TAGS, TokenBucket, around, combined_query  # noqa: E402
+from search_core import RADII  # noqa: E402
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# name: (query, approximate lat, lon, synthetic POIs within max(RADII))
+LOCATIONS = {
+    'metro': ("Connaught Place, New Delhi", 28.6315, 77.2167, 12000),
+    'town': ("Palampur, Himachal Pradesh", 32.1109, 76.5363, 900),
+    'rural': ("Hanle, Ladakh", 32.7794, 78.9660, 40),
+}
+
+
+def fixture_path(name):
+    return os.path.join(FIXTURE_DIR, f"{name}.json.gz")
+
+
+def record(name, engine):
+    query, *_ = LOCATIONS[name]
+    location = engine.geocode(query + ", India")
+    if location is None:
+        raise SystemExit(f"Nominatim has no match for {query!r}")
+    lat, lon = location.latitude, location.longitude
+    elements = engine.query(combined_query({t: [around(lat, lon, max(RADII))] for t in SERVICE_TAGS}, None),
+                            time.monotonic() + 300)
+    elements.sort(key=lambda e: (e['type'], e['id']))
+    fixture = {'name': name, 'query': query, 'recorded': time.strftime("%Y-%m-%d"),
+               'nominatim': [location.raw], 'elements': elements}
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    with open(fixture_path(name), 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as f:
+        f.write(json.dumps(fixture, separators=(',', ':'), sort_keys=True).encode('utf-8'))
+    print(f"{name}: {len(elements)} elements around {location.address}")
+
+
+def synthetic_elements(lat, lon, n, radius_km=max(RADII), seed=0):
+    """Overpass-shaped nodes and ways spread over a disc, denser towards the centre."""
+    rng = random.Random(seed)
+    tags = list(SERVICE_TAGS.values())
+    elements = []
+    for i in range(n):
+        # Half uniform over the disc, half concentrated near the centre
+        r = radius_km * (math.sqrt(rng.random()) if i % 2 else rng.random() ** 2)
+        theta = rng.uniform(0, 2 * math.pi)
+        plat = lat + r * math.cos(theta) / 111.32
+        plon = lon + r * math.sin(theta) / (111.32 * math.cos(math.radians(lat)))
+        key, value = rng.choice(tags)
+        elem_tags = {key: value, 'name': f"Facility {i}"}
+        if rng.random() < 0.6:
+            elem_tags.update({'addr:housenumber': str(rng.randint(1, 200)), 'addr:street': f"Road {i % 97}"})
+        if rng.random() < 0.4:
+            elem_tags['phone'] = f"+91 11 {rng.randint(20000000, 29999999)}"
+        if rng.random() < 0.3:
+            elem_tags['opening_hours'] = rng.choice(["24/7", "Mo-Sa 09:00-18:00", "Mo-Fr 10:00-17:00; Sa 10:00-14:00"])
+        if rng.random() < 0.7:
+            elements.append({'type': 'node', 'id': i, 'lat': plat, 'lon': plon, 'tags': elem_tags})
+        else:
+            elements.append({'type': 'way', 'id': i, 'center': {'lat': plat, 'lon': plon}, 'tags': elem_tags})
+    return elements
+
+
+def load(name, synthetic=False):
+    """(fixture dict, "recorded" or "synthetic"); without a recording, synthetic data only if asked for."""
+    path = fixture_path(name)
+    if os.path.exists(path):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return json.load(f), "recorded"
+    if not synthetic:
+        raise SystemExit(f"No recorded fixture for {name!r} ({path}): record it with "
+                         f"`python benchmarks/fixtures.py record {name}` or pass --synthetic")
+    query, lat, lon, n = LOCATIONS[name]
+    return {'name': name, 'query': query, 'nominatim': [{'display_name': query, 'lat': str(lat), 'lon': str(lon)}],
+            'elements': synthetic_elements(lat, lon, n)}, "synthetic"
+
+
+def main(argv):
+    if not argv or argv[0] != 'record':
+        raise SystemExit(__doc__)
+    engine = FetchEngine([OVERPASS_URL], TokenBucket(rate=1), TokenBucket(rate=1),
+                         request_timeout=180)
+    for name in argv[1:] or LOCATIONS:
+        record(name, engine)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
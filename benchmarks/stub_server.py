@@ -0,0 +1,114 @@
+"""Local stand-in for Overpass mirrors and Nominatim.
+
+Serves canned responses with configurable misbehaviour, so the fetch engine's
+timeouts, retries, failover and circuit breaker can be exercised offline:
+
+    python benchmarks/stub_server.py --port 8001 --mode slow --delay 20
+    python benchmarks/stub_server.py --port 8002 --mode ratelimit --fail-rate 0.5
+    OVERPASS_MIRRORS=http://127.0.0.1:8001,http://127.0.0.1:8002 streamlit run app.py
+
+Modes: ok, slow (sleep --delay seconds), fail (HTTP 504), ratelimit (HTTP 429
+with probability --fail-rate), remark (200 with an Overpass runtime error).
+Queries asking for [out:csv(...)] are answered in Overpass's CSV layout.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+DEFAULT_ELEMENTS = [
+    {'type': 'node', 'id': 1, 'lat': 28.6328, 'lon': 77.2197,
+     'tags': {'amenity': 'hospital', 'name': 'Stub Hospital', 'phone': '011-0000000'}},
+    {'type': 'way', 'id': 2, 'center': {'lat': 28.6289, 'lon': 77.2065},
+     'tags': {'amenity': 'police', 'name': 'Stub Police Station'}},
+]
+
+
+def make_handler(mode, delay=0.0, fail_rate=1.0, elements=None, geocode=None):
+    elements = DEFAULT_ELEMENTS if elements is None else elements
+    geocode = geocode if geocode is not None else [
+        {'display_name': 'Connaught Place, New Delhi, India', 'lat': '28.6315', 'lon': '77.2167'}]
+
+    class Handler(BaseHTTPRequestHandler):
+        hits = 0
+
+        def _reply(self, status, body):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _reply_csv(self, query, elements):
+            columns = [c.strip('"') for c in query.split('[out:csv(', 1)[1].split(';', 1)[0].split(',')]
+            rows = ["\t".join('@' + c[2:] if c.startswith('::') else c for c in columns)]
+            for elem in elements:
+                center = elem.get('center', elem)
+                values = {'::type': elem['type'], '::id': elem['id'], '::lat': center.get('lat', ''),
+                          '::lon': center.get('lon', '')}
+                rows.append("\t".join(str(values.get(c, elem.get('tags', {}).get(c, ''))) for c in columns))
+            payload = ("\n".join(rows) + "\n").encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/csv')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _serve(self, body, query=''):
+            Handler.hits += 1
+            if mode == 'slow':
+                time.sleep(delay)
+            elif mode == 'fail':
+                return self._reply(504, {'error': 'gateway timeout'})
+            elif mode == 'ratelimit' and random.random() < fail_rate:
+                return self._reply(429, {'error': 'rate limited'})
+            elif mode == 'remark':
+                return self._reply(200, {'elements': [], 'remark': 'runtime error: Query timed out'})
+            if '[out:csv(' in query:
+                return self._reply_csv(query, body['elements'])
+            self._reply(200, body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path.endswith('/search'):
+                return self._serve(geocode)
+            self._serve({'elements': elements})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            query = parse_qs(self.rfile.read(length).decode()).get('data', [''])[0]
+            self._serve({'elements': elements}, query)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def serve(port, mode='ok', **kwargs):
+    """Start a stub server on a background thread; returns the server (call .shutdown() to stop)."""
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(mode, **kwargs))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--mode', choices=['ok', 'slow', 'fail', 'ratelimit', 'remark'], default='ok')
+    parser.add_argument('--delay', type=float, default=20.0)
+    parser.add_argument('--fail-rate', type=float, default=1.0)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', args.port),
+                                 make_handler(args.mode, delay=args.delay, fail_rate=args.fail_rate))
+    print(f"Stub upstream ({args.mode}) on http://127.0.0.1:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+from opening_hours import CLOSED, OPEN, UNKNOWN
+
+CARD_TEMPLATE = """
+<div class="result-card">
+    <div class="result-top">
+        <div class="result-name">{Name}</div>
+        <div class="result-badge">{Distance_km} km{eta}</div>
+    </div>
+    <div class="result-detail"><strong>📍</strong> {Address}</div>
+    <div class="result-detail"><strong>📞</strong> {Phone}</div>
+    <div class="result-detail"><strong>🕒</strong> {Hours}{status}</div>
+    <div class="result-actions">
+        <a href="{Google_Maps}" target="_blank" class="btn-modern btn-green">🗺️ View Map</a>
+        <a href="{Directions}" target="_blank" class="btn-modern btn-blue">🧭 Directions</a>
+    </div>
+</div>
+"""
+
+
+STATUS_HTML = {OPEN: '<span class="hours-open">Open now</span>', CLOSED: '<span class="hours-closed">Closed</span>'}
+
+
+def card_html(records, statuses=None):
+    """Result card markup for each record, in order; `statuses` (from ResultSet.open_at) adds open/closed tags."""
+    statuses = [UNKNOWN] * len(records) if statuses is None else statuses
+    return [CARD_TEMPLATE.format(**r, eta=f" · {r['ETA_min']:.0f} min" if r.get('ETA_min') is not None else "",
+                                 status=STATUS_HTML.get(status, ""))
+            for r, status in zip(records, statuses)]
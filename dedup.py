@@ -0,0 +1,193 @@
+"""Merging of facilities mapped more than once.
+
+The same hospital often exists in OSM as a node and as a building way or a
+campus relation, and a facility can appear under two related types (a clinic
+node inside a hospital way). Elements are merged by OSM identity, then by
+proximity plus a similar name. Names made only of generic words ("ATM",
+"Hospital") say nothing about which facility they are, so like unnamed
+building outlines they only join their nearest named neighbour and never link
+two facilities together. Candidates come from a grid of cells one merge
+radius wide, so each element is only compared with its own and neighbouring
+cells instead of every other element. A merged element keeps the tags of its
+richest member, topped up with phone, hours and address from the others.
+"""
+import math
+import re
+import unicodedata
+from difflib import SequenceMatcher
+
+from overpass import element_coords
+
+# Types that describe overlapping facilities; duplicates are kept under the first
+RELATED_TYPES = [("Hospital", "Clinic", "Doctors")]
+
+NAME_TAGS = ('name', 'name:en', 'brand', 'operator')
+RICH_TAGS = ('phone', 'contact:phone', 'opening_hours', 'addr:housenumber', 'addr:street', 'addr:suburb',
+             'addr:city', 'addr:state', 'addr:full', 'name:en', 'website')
+
+# Words that describe a kind of facility rather than name one
+GENERIC_WORDS = frozenset("""
+    a and the of hospital hospitals clinic clinics nursing home doctor doctors dr dental pharmacy chemist chemists
+    druggist medical medicals medicine store stores shop health care healthcare centre center dispensary
+    government govt general district primary community phc chc opd emergency atm bank police station thana
+    chowki post fire brigade embassy consulate tourist tourism information office
+""".split())
+
+METRES_PER_DEGREE = 111_320
+
+_ASCII_WORD = re.compile(r"[a-z0-9]+")
+
+
+def related_types(r_type):
+    """The types whose elements may duplicate `r_type`'s, in merge priority order."""
+    for group in RELATED_TYPES:
+        if r_type in group:
+            return group
+    return (r_type,)
+
+
+def _group(r_type):
+    return related_types(r_type)[0]
+
+
+def normalize_name(name):
+    if name.isascii():
+        return " ".join(_ASCII_WORD.findall(name.lower()))
+    # Letters, digits and combining marks (Devanagari vowel signs) make up words
+    text = "".join(c if c.isalnum() or unicodedata.category(c)[0] == 'M' else " " for c in name.casefold())
+    return " ".join(text.split())
+
+
+def _name_key(name):
+    """(normalized name, tokens, branch numbers, name without spaces) for comparisons, or None."""
+    norm = normalize_name(name)
+    if not norm:
+        return None
+    tokens = norm.split()
+    return norm, frozenset(tokens), tuple(t for t in tokens if t.isdigit()), norm.replace(" ", "")
+
+
+def generic_name(key):
+    return key[1] <= GENERIC_WORDS
+
+
+def similar_names(a, b, threshold=0.85):
+    """Whether two `_name_key`s likely refer to the same facility."""
+    if a[3] == b[3]:
+        # Equal up to spacing, which also catches dotted abbreviations ("A.I.I.M.S.")
+        return True
+    # Branch numbers differ: "Apollo Clinic 2" is not "Apollo Clinic 3"
+    if a[2] != b[2]:
+        return False
+    # One name's words all in the other's, when the shorter one is specific enough to name a facility:
+    # "Safdarjung Hospital" in "Safdarjung Hospital Campus", but not "Hospital" or a lone "Apollo"
+    small, large = sorted((a[1], b[1]), key=len)
+    if small <= large and len(small) > 1 and not small <= GENERIC_WORDS:
+        return True
+    m = SequenceMatcher(None, a[0], b[0])
+    return m.real_quick_ratio() >= threshold and m.quick_ratio() >= threshold and m.ratio() >= threshold
+
+
+def _element_name(elem):
+    tags = elem.get('tags', {})
+    return next((tags[k] for k in NAME_TAGS if tags.get(k)), None)
+
+
+def _merge(members):
+    """One element from a set of duplicates: the richest specifically named one, filled in from the rest."""
+    def rank(elem):
+        key = _name_key(_element_name(elem) or "")
+        return key is not None and not generic_name(key), key is not None, len(elem.get('tags', {}))
+
+    base = max(members, key=rank)
+    tags = dict(base.get('tags', {}))
+    for elem in members:
+        for key in RICH_TAGS:
+            if key not in tags and key in elem.get('tags', {}):
+                tags[key] = elem['tags'][key]
+    return {**base, 'tags': tags}
+
+
+def dedupe(type_elements, radius_m=100):
+    """Merge duplicate elements in `{type: [elements]}`; returns the same shape.
+
+    Elements within `radius_m` of each other merge when their names are similar.
+    An unnamed way or relation (a building outline), or an element with a
+    generic name, joins the nearest specifically named element. Duplicates
+    across RELATED_TYPES are kept under the first type.
+    """
+    priority = {t: i for group in RELATED_TYPES for i, t in enumerate(group)}
+    items, seen = [], set()
+    for r_type, elems in type_elements.items():
+        for elem in elems:
+            key = (r_type, elem.get('type'), elem.get('id'))
+            if key in seen:
+                continue
+            seen.add(key)
+            name = _element_name(elem)
+            items.append((_group(r_type), elem, element_coords(elem), name and _name_key(name), r_type))
+
+    parent = list(range(len(items)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    located = [i for i, item in enumerate(items) if item[2] is not None]
+    if radius_m > 0 and located:
+        # Cells at least radius_m wide everywhere, so neighbours are in adjacent cells
+        lat_step = radius_m / METRES_PER_DEGREE
+        max_lat = max(abs(items[i][2][0]) for i in located)
+        lon_step = lat_step / max(math.cos(math.radians(max_lat)), 0.01)
+        limit = radius_m * radius_m
+
+        def cell(i):
+            lat, lon = items[i][2]
+            return items[i][0], math.floor(lat / lat_step), math.floor(lon / lon_step)
+
+        # Only specifically named elements are merge targets; cells are per type group
+        cells, unnamed = {}, []
+        for i in located:
+            if items[i][3] is not None and not generic_name(items[i][3]):
+                cells.setdefault(cell(i), []).append(i)
+            elif items[i][3] is not None or items[i][1].get('type') != 'node':
+                unnamed.append(i)
+
+        def neighbours(i):
+            """(squared distance in m, j) for named same-group elements within radius_m of i."""
+            group, cy, cx = cell(i)
+            lat, lon = items[i][2]
+            scale = METRES_PER_DEGREE * math.cos(math.radians(lat))
+            for dy in (-1, 0, 1):
+                for dx in (-1, 0, 1):
+                    for j in cells.get((group, cy + dy, cx + dx), ()):
+                        jlat, jlon = items[j][2]
+                        d2 = ((jlat - lat) * METRES_PER_DEGREE) ** 2 + ((jlon - lon) * scale) ** 2
+                        if d2 <= limit and j != i:
+                            yield d2, j
+
+        for members in cells.values():
+            for i in members:
+                name = items[i][3]
+                for _, j in neighbours(i):
+                    if j > i and find(i) != find(j) and similar_names(name, items[j][3]):
+                        parent[find(j)] = find(i)
+
+        # Outlines and generic names join one named element, so they never bridge two facilities
+        for i in unnamed:
+            named = list(neighbours(i))
+            if named:
+                parent[i] = find(min(named)[1])
+
+    components = {}
+    for i in range(len(items)):
+        components.setdefault(find(i), []).append(i)
+
+    result = {t: [] for t in type_elements}
+    for members in components.values():
+        r_type = min((items[i][4] for i in members), key=lambda t: priority.get(t, 0))
+        elems = [items[i][1] for i in members]
+        result[r_type].append(elems[0] if len(elems) == 1 else _merge(elems))
+    return result
@@ -0,0 +1,152 @@
+"""Result downloads in CSV, GeoJSON, Parquet and plain text.
+
+Every format is produced as an iterator of chunks, `CHUNK_ROWS` results at a
+time, straight from the columnar ResultSet, so an export is only generated
+when someone asks for it and never has to sit in memory as one string.
+Parquet needs pyarrow (a Streamlit dependency; `pip install pyarrow` for the
+API alone).
+"""
+import csv
+import io
+import json
+
+from results import TYPES, directions_url, maps_url
+
+CHUNK_ROWS = 5000
+
+# format: (media type, file extension)
+FORMATS = {
+    'csv': ("text/csv", "csv"),
+    'geojson': ("application/geo+json", "geojson"),
+    'parquet': ("application/vnd.apache.parquet", "parquet"),
+    'txt': ("text/plain", "txt"),
+}
+
+
+def _parts(results, chunk_rows):
+    for start in range(0, len(results), chunk_rows):
+        yield results.take(slice(start, start + chunk_rows))
+
+
+def _base_rows(part):
+    strings, origin = part.strings, part.origin
+    for code, text, dist, lat, lon in zip(part.type_code.tolist(), part.text.tolist(), part.dist.tolist(),
+                                          part.lat.tolist(), part.lon.tolist()):
+        name, address, phone, hours = (strings[c] for c in text)
+        yield (name, TYPES[code], dist, address, phone, hours, lat, lon, maps_url(lat, lon),
+               directions_url(origin, lat, lon))
+
+
+def _rows(part):
+    """Row tuples in `part.fields` order; a missing drive time is None."""
+    rows = _base_rows(part)
+    if part.eta is None:
+        return rows
+    return (row[:3] + (None if eta != eta else eta,) + row[3:] for row, eta in zip(rows, part.eta.tolist()))
+
+
+def iter_csv(results, chunk_rows=CHUNK_ROWS):
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator='\n')
+    writer.writerow(results.fields)
+    for part in _parts(results, chunk_rows):
+        writer.writerows(_rows(part))
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def iter_geojson(results, chunk_rows=CHUNK_ROWS):
+    yield '{"type":"FeatureCollection","features":['
+    first = True
+    for part in _parts(results, chunk_rows):
+        features = []
+        for row in _rows(part):
+            props = dict(zip(part.fields, row))
+            lat, lon = props.pop('Latitude'), props.pop('Longitude')
+            features.append(json.dumps({'type': "Feature", 'geometry': {'type': "Point", 'coordinates': [lon, lat]},
+                                        'properties': props}, ensure_ascii=False, separators=(',', ':')))
+        yield ("" if first else ",") + ",".join(features)
+        first = False
+    yield ']}'
+
+
+def iter_text(results, place, chunk_rows=CHUNK_ROWS):
+    yield f"Services near {place}\n\n"
+    n = 0
+    for part in _parts(results, chunk_rows):
+        lines = []
+        for row in _rows(part):
+            n += 1
+            r = dict(zip(part.fields, row))
+            eta = f", {r['ETA_min']:.0f} min drive" if r.get('ETA_min') is not None else ""
+            lines.append(f"{n}. {r['Name']} ({r['Type']}) - {r['Distance_km']} km{eta}\n   {r['Phone']}\n"
+                         f"   {r['Google_Maps']}\n")
+        yield "".join(lines)
+
+
+class _Sink(io.RawIOBase):
+    """Write-only stream handing out what was written so far; tell() keeps counting for the Parquet footer."""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def take(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def iter_parquet(results, chunk_rows=CHUNK_ROWS):
+    """Parquet with one row group per chunk; Type is dictionary-encoded."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {'Type': pa.dictionary(pa.int8(), pa.string()), 'Distance_km': pa.float64(), 'ETA_min': pa.float64(),
+             'Latitude': pa.float64(), 'Longitude': pa.float64()}
+    schema = pa.schema([(field, types.get(field, pa.string())) for field in results.fields])
+    sink = _Sink()
+    with pq.ParquetWriter(sink, schema, compression='zstd') as writer:
+        for part in _parts(results, chunk_rows):
+            columns = zip(*_rows(part))
+            arrays = [pa.array(col, type=field.type) for col, field in zip(columns, schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.take()
+    yield sink.take()
+
+
+def iter_export(results, fmt, place=""):
+    """Chunks (str, or bytes for Parquet) of `results` in format `fmt`."""
+    if fmt == 'csv':
+        return iter_csv(results)
+    if fmt == 'geojson':
+        return iter_geojson(results)
+    if fmt == 'parquet':
+        return iter_parquet(results)
+    if fmt == 'txt':
+        return iter_text(results, place)
+    raise ValueError(f"unknown export format {fmt!r}; choose from {', '.join(FORMATS)}")
+
+
+def iter_export_bytes(results, fmt, place=""):
+    for chunk in iter_export(results, fmt, place):
+        yield chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+
+
+def export_bytes(results, fmt, place=""):
+    """The whole export, for consumers that need it in one piece (Streamlit's download button)."""
+    return b"".join(iter_export_bytes(results, fmt, place))
@@ -0,0 +1,303 @@
+"""Async HTTP engine for Overpass and Nominatim.
+
+Every upstream call gets a per-request timeout bounded by the search
+deadline the caller passes in, a time.monotonic() end time shared by all of
+one search's calls. 429/5xx responses and transport errors are retried with
+jittered exponential backoff, rotating across the configured Overpass mirrors. A
+slow request can be hedged onto a second mirror, and a per-mirror circuit
+breaker stops sending traffic to a mirror that keeps failing. A 429 is not a
+failure: the mirror is only held back for its Retry-After. Overpass
+responses are parsed as they stream in, keeping only the fields a result needs.
+"""
+import asyncio
+import codecs
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import httpx
+from geopy.location import Location
+
+from metrics import metrics, span
+from overpass import element_parser
+
+USER_AGENT = "emergency_finder_india"
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class FetchError(Exception):
+    """An upstream call failed for good (retries, mirrors or deadline exhausted)."""
+
+
+class RetryableError(Exception):
+    """A response worth retrying, possibly on another mirror."""
+
+
+def retry_after(res):
+    """Seconds a response's Retry-After header asks to wait, or None."""
+    value = res.headers.get('retry-after', '').strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures; lets one probe through every `reset_after` seconds.
+
+    A rate-limited mirror is held back until its Retry-After without counting as a failure.
+    """
+
+    def __init__(self, threshold=3, reset_after=60):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self.held_until = 0.0
+        self.last_error = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if time.monotonic() < self.held_until:
+                return False
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_after:
+                # Half-open: the next result decides whether it closes again
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def failure(self, error=None):
+        with self.lock:
+            self.failures += 1
+            self.last_error = error
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+    def hold(self, seconds, error=None):
+        with self.lock:
+            self.held_until = max(self.held_until, time.monotonic() + seconds)
+            self.last_error = error
+
+
+class FetchEngine:
+    def __init__(self, mirrors, limiter, nominatim_limiter, nominatim_url=NOMINATIM_URL,
+                 request_timeout=35, retries=3, backoff=0.5,
+                 hedge_after=None, concurrency=4, breaker_threshold=3, breaker_reset=60):
+        self.mirrors = list(mirrors)
+        self.limiter = limiter
+        self.nominatim_limiter = nominatim_limiter
+        self.nominatim_url = nominatim_url
+        self.request_timeout = request_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge_after = hedge_after
+        self.concurrency = concurrency
+        self.breakers = {m: CircuitBreaker(breaker_threshold, breaker_reset) for m in self.mirrors}
+
+    def _client(self):
+        limits = httpx.Limits(max_connections=self.concurrency * 2, max_keepalive_connections=self.concurrency)
+        return httpx.AsyncClient(headers={"User-Agent": USER_AGENT}, limits=limits)
+
+    def _timeout(self, deadline):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise FetchError("search deadline exceeded")
+        return min(self.request_timeout, remaining)
+
+    async def _backoff(self, attempt, deadline, at_least=0):
+        delay = max(self.backoff * 2 ** attempt * random.uniform(0.5, 1.5), at_least)
+        if time.monotonic() + delay >= deadline:
+            return False
+        await asyncio.sleep(delay)
+        return True
+
+    async def _attempt(self, client, mirror, query, deadline):
+        await asyncio.sleep(self.limiter.reserve())
+        breaker = self.breakers[mirror]
+        try:
+            async with client.stream('POST', mirror, data={'data': query},
+                                     timeout=self._timeout(deadline)) as res:
+                metrics.inc("upstream_responses_total", upstream="overpass", status=res.status_code)
+                if res.status_code == 429:
+                    # Busy, not broken: keep off this mirror for as long as it asks
+                    error = f"{mirror}: HTTP 429"
+                    breaker.hold(retry_after(res) or self.backoff, error)
+                    raise RetryableError(error)
+                if res.status_code in RETRY_STATUSES:
+                    error = f"{mirror}: HTTP {res.status_code}"
+                    breaker.failure(error)
+                    raise RetryableError(error)
+                if res.status_code >= 400:
+                    # The query itself was rejected; another mirror won't help
+                    raise FetchError(f"{mirror}: HTTP {res.status_code}")
+                parser = element_parser(res.headers.get('content-type', ''))
+                decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+                elements = []
+                async for chunk in res.aiter_bytes():
+                    elements.extend(parser.feed(decoder.decode(chunk)))
+                elements.extend(parser.feed(decoder.decode(b'', final=True)))
+                remark = parser.close()
+        except httpx.TransportError as e:
+            metrics.inc("upstream_responses_total", upstream="overpass", status=type(e).__name__)
+            breaker.failure(f"{mirror}: {e!r}")
+            raise RetryableError(f"{mirror}: {e!r}") from e
+        except ValueError as e:
+            breaker.failure(f"{mirror}: invalid response ({e})")
+            raise RetryableError(f"{mirror}: invalid response ({e})") from e
+        # Overpass reports query timeouts and memory exhaustion as a 200 with a remark
+        if 'runtime error' in remark:
+            breaker.failure(f"{mirror}: {remark}")
+            raise RetryableError(f"{mirror}: {remark}")
+        breaker.success()
+        return elements
+
+    async def _hedged(self, client, primary, backup, query, deadline):
+        if backup is None or self.hedge_after is None:
+            return await self._attempt(client, primary, query, deadline)
+
+        first = asyncio.create_task(self._attempt(client, primary, query, deadline))
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_after)
+        if done:
+            return first.result()
+
+        # Primary is slow: race it against the backup mirror
+        metrics.inc("upstream_hedges_total", upstream="overpass")
+        tasks = {first, asyncio.create_task(self._attempt(client, backup, query, deadline))}
+        error = None
+        try:
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _available(self, deadline):
+        """Mirrors that may be tried now, after waiting out rate limits if nothing else stands in the way."""
+        mirrors = [m for m in self.mirrors if self.breakers[m].allow()]
+        if not mirrors:
+            held = [b.held_until for b in self.breakers.values() if b.opened_at is None]
+            if held and min(held) < deadline:
+                await asyncio.sleep(max(min(held) - time.monotonic(), 0))
+                mirrors = [m for m in self.mirrors if self.breakers[m].allow()]
+        return mirrors
+
+    async def overpass(self, client, query, deadline):
+        """Elements for one Overpass query, with retries and mirror failover."""
+        error = None
+        for attempt in range(self.retries + 1):
+            mirrors = await self._available(deadline)
+            if not mirrors:
+                last = error or next((b.last_error for b in self.breakers.values() if b.last_error), None)
+                raise FetchError(f"all Overpass mirrors are unavailable (last error: {last})") from error
+            if attempt:
+                metrics.inc("upstream_retries_total", upstream="overpass")
+            primary = mirrors[attempt % len(mirrors)]
+            backup = mirrors[(attempt + 1) % len(mirrors)] if len(mirrors) > 1 else None
+            try:
+                return await self._hedged(client, primary, backup, query, deadline)
+            except RetryableError as e:
+                error = e
+            if not await self._backoff(attempt, deadline):
+                break
+        raise FetchError(f"Overpass query failed: {error}") from error
+
+    async def _query(self, query, deadline):
+        async with self._client() as client:
+            return await self.overpass(client, query, deadline)
+
+    def query(self, query, deadline):
+        """Elements for a single Overpass query, by time.monotonic() `deadline`; raises FetchError."""
+        return asyncio.run(self._query(query, deadline))
+
+    async def _stream(self, queries, deadline):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async with self._client() as client:
+            async def run(key, query):
+                async with semaphore:
+                    with span("overpass", type=key) as extra:
+                        try:
+                            elements = await self.overpass(client, query, deadline)
+                        except FetchError as e:
+                            extra['error'] = 'FetchError'
+                            return key, e
+                        extra['elements'] = len(elements)
+                        return key, elements
+
+            tasks = [asyncio.create_task(run(k, q)) for k, q in queries.items()]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    yield await next_done
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stream(self, queries, deadline):
+        """Run `{key: query}` concurrently by `deadline`, yielding (key, elements or FetchError) as each finishes."""
+        loop = asyncio.new_event_loop()
+        results = self._stream(queries, deadline)
+        try:
+            while True:
+                try:
+                    item = loop.run_until_complete(results.__anext__())
+                except StopAsyncIteration:
+                    return
+                yield item
+        finally:
+            loop.run_until_complete(results.aclose())
+            loop.close()
+
+    async def _geocode(self, query):
+        deadline = time.monotonic() + self.request_timeout
+        params = {'q': query, 'format': 'json', 'limit': 1}
+        error = None
+        async with self._client() as client:
+            for attempt in range(self.retries + 1):
+                wait = 0
+                if attempt:
+                    metrics.inc("upstream_retries_total", upstream="nominatim")
+                await asyncio.sleep(self.nominatim_limiter.reserve())
+                try:
+                    res = await client.get(self.nominatim_url, params=params, timeout=self._timeout(deadline))
+                except httpx.TransportError as e:
+                    metrics.inc("upstream_responses_total", upstream="nominatim", status=type(e).__name__)
+                    error = e
+                else:
+                    metrics.inc("upstream_responses_total", upstream="nominatim", status=res.status_code)
+                    if res.status_code not in RETRY_STATUSES:
+                        if res.status_code >= 400:
+                            raise FetchError(f"Nominatim: HTTP {res.status_code}")
+                        hits = res.json()
+                        if not hits:
+                            return None
+                        hit = hits[0]
+                        return Location(hit['display_name'], (float(hit['lat']), float(hit['lon'])), hit)
+                    error = f"HTTP {res.status_code}"
+                    wait = retry_after(res) or 0
+                if not await self._backoff(attempt, deadline, wait):
+                    break
+        raise FetchError(f"Nominatim lookup failed: {error}") from (error if isinstance(error, Exception) else None)
+
+    def geocode(self, query):
+        """Best Nominatim match for `query` as a geopy Location, or None if nothing matched."""
+        return asyncio.run(self._geocode(query))
@@ -0,0 +1,291 @@
+"""Local gazetteer of Indian places: type-ahead suggestions and geocoding without Nominatim.
+
+Build it ahead of time from the GeoNames dumps (places: download.geonames.org/
+export/dump/IN.zip, pincodes: download.geonames.org/export/zip/IN.zip) and/or an
+Overpass JSON dump of place=* nodes:
+
+    python gazetteer.py --geonames IN.txt --postal IN-postal.txt -o gazetteer.npz
+    python gazetteer.py --overpass places.json -o gazetteer.npz
+
+Every name, alternate name, "name district state" combination and pincode is a
+normalized key; the keys are sorted and packed into one UTF-8 blob, so a
+prefix is a binary-searched range of keys (a flattened trie) and an exact
+query is a range of length one or more. Suggestions are the most popular
+places in the range; for one- and two-letter prefixes, whose ranges are huge,
+they are precomputed. A query resolves locally only when it names one place,
+or one that dwarfs the others of that name; anything else goes to Nominatim.
+"""
+import argparse
+import csv
+import json
+import time
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+from geopy.location import Location
+
+from geocode_cache import normalize_query
+
+KINDS = ['state', 'district', 'city', 'town', 'locality', 'village', 'pincode']
+# Popularity of a place without a known population
+BASE_POPULARITY = {'state': 10_000_000, 'district': 1_000_000, 'city': 100_000, 'town': 20_000,
+                   'locality': 5_000, 'village': 500, 'pincode': 2_000}
+OSM_KINDS = {'state': 'state', 'district': 'district', 'city': 'city', 'town': 'town', 'village': 'village',
+             'hamlet': 'village', 'suburb': 'locality', 'quarter': 'locality', 'neighbourhood': 'locality',
+             'locality': 'locality'}
+SHORT_PREFIX = 2
+SHORT_TOP = 16
+# An ambiguous name resolves to its most popular place only if that is this many times the next one
+DOMINANCE = 10
+_LAST = "\U0010ffff"
+
+
+class Place:
+    __slots__ = ('label', 'lat', 'lon', 'kind', 'popularity', 'names', 'context')
+
+    def __init__(self, label, lat, lon, kind, popularity, names, context=()):
+        self.label = label
+        self.lat = lat
+        self.lon = lon
+        self.kind = kind
+        self.popularity = popularity
+        self.names = names
+        self.context = context
+
+
+def _label(name, *context):
+    parts = [name]
+    for part in context:
+        if part and part not in parts:
+            parts.append(part)
+    return ", ".join(parts)
+
+
+def read_geonames(path):
+    """Places from a GeoNames country dump (IN.txt): ADM1/ADM2 areas and populated places."""
+    rows = []
+    with open(path, encoding='utf-8') as f:
+        for row in csv.reader(f, delimiter='\t', quoting=csv.QUOTE_NONE):
+            if len(row) >= 15 and (row[6] == 'P' or row[7] in ('ADM1', 'ADM2')):
+                rows.append(row)
+    states = {r[10]: r[1] for r in rows if r[7] == 'ADM1'}
+    districts = {(r[10], r[11]): r[1] for r in rows if r[7] == 'ADM2'}
+    for (_, name, ascii_name, alternates, lat, lon, _, code, _, _, admin1, admin2, _, _,
+         population, *_) in rows:
+        population = int(population or 0)
+        if code == 'ADM1':
+            kind, context = 'state', ()
+        elif code == 'ADM2':
+            kind, context = 'district', (states.get(admin1),)
+        else:
+            kind = 'locality' if code == 'PPLX' else ('city' if population >= 100_000 else
+                                                      'town' if population >= 10_000 else 'village')
+            context = (districts.get((admin1, admin2)), states.get(admin1))
+        names = [name, ascii_name] + [a for a in alternates.split(',') if a]
+        yield Place(_label(name, *context), float(lat), float(lon), kind,
+                    max(population, BASE_POPULARITY[kind]), names, context)
+
+
+def read_postal(path):
+    """Pincodes, and the post office localities they serve, from a GeoNames postal code dump."""
+    pincodes = {}
+    with open(path, encoding='utf-8') as f:
+        for row in csv.reader(f, delimiter='\t', quoting=csv.QUOTE_NONE):
+            if len(row) < 11 or not row[9] or not row[10]:
+                continue
+            _, pincode, place, state, _, district, *_ = row
+            lat, lon = float(row[9]), float(row[10])
+            pincodes.setdefault(pincode, (district, state, []))[2].append((lat, lon))
+            yield Place(_label(place, district, state), lat, lon, 'locality', BASE_POPULARITY['locality'] // 5,
+                        [place], (district, state))
+    for pincode, (district, state, points) in pincodes.items():
+        lat, lon = np.mean(points, axis=0)
+        yield Place(_label(pincode, district, state), float(lat), float(lon), 'pincode',
+                    BASE_POPULARITY['pincode'], [pincode])
+
+
+def read_overpass(path):
+    """Places from an Overpass JSON dump of place=* nodes."""
+    with open(path, encoding='utf-8') as f:
+        elements = json.load(f).get('elements', [])
+    for elem in elements:
+        tags = elem.get('tags', {})
+        kind = OSM_KINDS.get(tags.get('place'))
+        if kind is None or not tags.get('name') or 'lat' not in elem:
+            continue
+        context = (tags.get('is_in:district') or tags.get('addr:district'),
+                   tags.get('is_in:state') or tags.get('addr:state'))
+        population = tags.get('population', '')
+        popularity = max(int(population) if population.isdigit() else 0, BASE_POPULARITY[kind])
+        names = [tags['name']] + [v for k, v in tags.items() if k.startswith(('name:', 'alt_name', 'old_name'))]
+        yield Place(_label(tags['name'], *context), elem['lat'], elem['lon'], kind, popularity, names, context)
+
+
+def _pack(strings):
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def build_gazetteer(places, path):
+    """Write the places to a packed .npz gazetteer; returns (places, keys)."""
+    # The same name within about 10 km (a place from several sources, a city and its district) is one
+    # entry: the most popular one, known by all their names
+    merged = {}
+    for place in places:
+        key = (normalize_query(place.names[0]), round(place.lat, 1), round(place.lon, 1))
+        old = merged.get(key)
+        if old is not None:
+            keep, other = (place, old) if place.popularity > old.popularity else (old, place)
+            keep.names = keep.names + other.names
+            place = keep
+        merged[key] = place
+    entries = sorted(merged.values(), key=lambda p: -p.popularity)
+
+    keys = set()
+    for i, place in enumerate(entries):
+        names = {normalize_query(n) for n in place.names} - {""}
+        context = [normalize_query(c) for c in place.context if c]
+        if context:
+            # "name district", "name state", "name district state" for the name and its ASCII form
+            primary = {normalize_query(n) for n in place.names[:2]} - {""}
+            names.update(" ".join([name, *combo]) for name in primary
+                         for combo in ([context[0]], [context[-1]], context))
+        names.add(normalize_query(place.label))
+        keys.update((key, i) for key in names)
+    keys = sorted(keys)
+
+    # Entry ids are popularity ranks, so the first distinct ids seen under a prefix are its top places
+    short = {}
+    for key, i in sorted(keys, key=lambda k: k[1]):
+        for n in range(1, SHORT_PREFIX + 1):
+            top = short.setdefault(key[:n], [])
+            if len(top) < SHORT_TOP and i not in top:
+                top.append(i)
+    short_ids = np.full((len(short), SHORT_TOP), -1, dtype=np.int32)
+    for row, top in enumerate(short.values()):
+        short_ids[row, :len(top)] = top
+
+    key_data, key_offsets = _pack([k for k, _ in keys])
+    label_data, label_offsets = _pack([p.label for p in entries])
+    short_data, short_offsets = _pack(list(short))
+    np.savez(
+        path,
+        key_data=key_data, key_offsets=key_offsets, key_entry=np.array([i for _, i in keys], dtype=np.int32),
+        label_data=label_data, label_offsets=label_offsets,
+        lat=np.array([p.lat for p in entries]), lon=np.array([p.lon for p in entries]),
+        kind=np.array([KINDS.index(p.kind) for p in entries], dtype=np.int8),
+        popularity=np.array([p.popularity for p in entries], dtype=np.int64),
+        short_data=short_data, short_offsets=short_offsets, short_ids=short_ids,
+    )
+    return len(entries), len(keys)
+
+
+class _Strings:
+    """Read-only sequence over strings packed by `_pack`, for bisect."""
+
+    def __init__(self, data, offsets):
+        self.data = data.tobytes()
+        self.offsets = offsets.tolist()
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.data[self.offsets[i]:self.offsets[i + 1]].decode('utf-8')
+
+
+class Gazetteer:
+    """Prefix suggestions and exact lookups over a gazetteer written by `build_gazetteer`."""
+
+    def __init__(self, path):
+        with np.load(path) as data:
+            self.keys = _Strings(data['key_data'], data['key_offsets'])
+            self.key_entry = data['key_entry']
+            self.labels = _Strings(data['label_data'], data['label_offsets'])
+            self.lat = data['lat']
+            self.lon = data['lon']
+            self.kind = data['kind']
+            self.popularity = data['popularity']
+            short = _Strings(data['short_data'], data['short_offsets'])
+            self.short = {short[i]: [e for e in row if e >= 0] for i, row in enumerate(data['short_ids'].tolist())}
+
+    def __len__(self):
+        return len(self.lat)
+
+    def place(self, i):
+        return {'label': self.labels[i], 'lat': float(self.lat[i]), 'lon': float(self.lon[i]),
+                'kind': KINDS[self.kind[i]]}
+
+    def suggest(self, text, limit=8):
+        """The most popular places whose name (or pincode) starts with `text`."""
+        prefix = normalize_query(text)
+        if not prefix:
+            return []
+        if len(prefix) <= SHORT_PREFIX:
+            return self._distinct(self.short.get(prefix, []), limit)
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + _LAST, lo)
+        # Entry ids are popularity ranks: the smallest ids in the range are the top places
+        ids = self.key_entry[lo:hi]
+        if len(ids) > limit * 4:
+            ids = ids[np.argpartition(ids, limit * 4)[:limit * 4]]
+        return self._distinct(np.unique(ids).tolist(), limit)
+
+    def _distinct(self, ids, limit):
+        # Places sharing a label (villages of one name in one district) would look like repeats
+        places, seen = [], set()
+        for i in ids:
+            place = self.place(i)
+            if place['label'] not in seen:
+                seen.add(place['label'])
+                places.append(place)
+                if len(places) == limit:
+                    break
+        return places
+
+    def resolve(self, query):
+        """The place `query` names, or None when it isn't known or is ambiguous."""
+        key = normalize_query(query)
+        lo = bisect_left(self.keys, key)
+        hi = bisect_right(self.keys, key, lo)
+        if lo == hi:
+            return None
+        ids = np.unique(self.key_entry[lo:hi])
+        if len(ids) > 1 and self.popularity[ids[0]] < DOMINANCE * self.popularity[ids[1]]:
+            return None
+        return self.place(ids[0])
+
+    def geocode(self, query):
+        """`resolve` as a geopy Location, like the Nominatim lookups."""
+        place = self.resolve(query)
+        if place is None:
+            return None
+        return Location(place['label'], (place['lat'], place['lon']), dict(place, source='gazetteer'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the local gazetteer from GeoNames and/or OSM dumps.")
+    parser.add_argument("--geonames", help="GeoNames country dump (IN.txt from export/dump)")
+    parser.add_argument("--postal", help="GeoNames postal code dump (IN.txt from export/zip)")
+    parser.add_argument("--overpass", help="Overpass JSON dump of place=* nodes")
+    parser.add_argument("-o", "--output", default="gazetteer.npz")
+    args = parser.parse_args(argv)
+    if not (args.geonames or args.postal or args.overpass):
+        parser.error("give at least one of --geonames, --postal, --overpass")
+
+    start = time.perf_counter()
+    places = []
+    if args.geonames:
+        places.extend(read_geonames(args.geonames))
+    if args.postal:
+        places.extend(read_postal(args.postal))
+    if args.overpass:
+        places.extend(read_overpass(args.overpass))
+    count, keys = build_gazetteer(places, args.output)
+    print(f"Indexed {count} places under {keys} keys into {args.output} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distance from (lat, lon) to every point, in one NumPy pass."""
+    p1 = np.radians(lat)
+    p2 = np.radians(np.asarray(lats, dtype=float))
+    dp = p2 - p1
+    dl = np.radians(np.asarray(lons, dtype=float) - lon)
+    a = np.sin(dp / 2) ** 2 + np.cos(p1) * np.cos(p2) * np.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def unit_xyz(lats, lons):
+    # Points on the unit sphere: chord length is monotonic in great-circle
+    # distance, so KD-tree radius and k-nearest queries are exact everywhere
+    p = np.radians(np.asarray(lats, dtype=float))
+    l = np.radians(np.asarray(lons, dtype=float))
+    return np.column_stack([np.cos(p) * np.cos(l), np.cos(p) * np.sin(l), np.sin(p)])
+
+
+def chord(km):
+    return 2 * np.sin(np.minimum(km / EARTH_RADIUS_KM, np.pi) / 2)
+
+
+def arc_km(chord_length):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(chord_length / 2, 1.0))
@@ -0,0 +1,89 @@
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from geopy.location import Location
+
+_PUNCT = re.compile(r"[^\w\s]+")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_query(place_name):
+    """Fold case, punctuation and whitespace so equivalent queries share a key."""
+    return _SPACE.sub(" ", _PUNCT.sub(" ", place_name.lower())).strip()
+
+
+class GeocodeCache:
+    """SQLite-backed geocode cache with TTL, LRU eviction and negative caching.
+
+    Point every replica at the same file to share one warm cache.
+    """
+
+    def __init__(self, path, ttl=30 * 86400, negative_ttl=3600, max_entries=100_000):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._writes = 0
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS geocode (
+                    key TEXT PRIMARY KEY,
+                    lat REAL, lon REAL, address TEXT,
+                    created REAL NOT NULL, accessed REAL NOT NULL
+                )""")
+            db.execute("CREATE INDEX IF NOT EXISTS geocode_accessed ON geocode (accessed)")
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def get(self, key, fresh_for=0):
+        """Return a Location, `None` for a cached miss, or raise KeyError.
+
+        Entries expiring within `fresh_for` seconds raise KeyError but are kept.
+        """
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute("SELECT lat, lon, address, created FROM geocode WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                raise KeyError(key)
+            lat, lon, address, created = row
+            ttl = self.ttl if address is not None else self.negative_ttl
+            usable = now - created <= ttl - fresh_for
+            if now - created > ttl:
+                # Raising inside the transaction would roll this back; KeyError follows the commit
+                db.execute("DELETE FROM geocode WHERE key = ?", (key,))
+            elif usable:
+                db.execute("UPDATE geocode SET accessed = ? WHERE key = ?", (now, key))
+        if not usable:
+            raise KeyError(key)
+        if address is None:
+            return None
+        return Location(address, (lat, lon), {})
+
+    def set(self, key, location):
+        now = time.time()
+        if location is None:
+            values = (key, None, None, None, now, now)
+        else:
+            values = (key, location.latitude, location.longitude, location.address, now, now)
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO geocode VALUES (?, ?, ?, ?, ?, ?)", values)
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self.evict(db)
+
+    def evict(self, db):
+        # Drop least recently used entries beyond the size bound
+        db.execute("""
+            DELETE FROM geocode WHERE key IN (
+                SELECT key FROM geocode ORDER BY accessed DESC LIMIT -1 OFFSET ?
+            )""", (self.max_entries,))
@@ -0,0 +1,92 @@
+import html
+import json
+
+from results import TYPES
+
+TYPE_COLORS = {'Hospital': 'blue', 'Clinic': 'lightblue', 'Doctors': 'purple',
+               'Pharmacy': 'green', 'Police Station': 'darkblue', 'Fire Station': 'orange',
+               'ATM': 'gray', 'Embassy': 'pink', 'Tourist Office': 'lightgreen'}
+
+# Above this many results markers are clustered and drawn client-side
+CLUSTER_THRESHOLD = 200
+
+POPUP_TEMPLATE = """<div style="width:220px;font-family:Inter;">
+    <h4 style="margin:0 0 8px 0;">{name}</h4>
+    <p style="margin:3px 0;font-size:0.85rem;"><b>Type:</b> {type}</p>
+    <p style="margin:3px 0;font-size:0.85rem;"><b>Distance:</b> {dist} km</p>
+    <p style="margin:3px 0;font-size:0.85rem;"><b>Phone:</b> {phone}</p>
+    <div style="margin-top:10px;">
+        <a href="{maps}" target="_blank"
+           style="background:#10b981;color:white;padding:6px 12px;text-decoration:none;
+                  border-radius:6px;margin-right:5px;display:inline-block;font-size:0.8rem;">Map</a>
+        <a href="{dirs}" target="_blank"
+           style="background:#3b82f6;color:white;padding:6px 12px;text-decoration:none;
+                  border-radius:6px;display:inline-block;font-size:0.8rem;">Directions</a>
+    </div>
+</div>"""
+
+# Row layout: [lat, lon, name, type, dist, phone, color]. The popup template and
+# the directions origin are shipped once; popups and their links are only built
+# when a marker is clicked.
+_CLUSTER_CALLBACK = """function (row) {
+    var esc = function (s) {
+        return String(s).replace(/[&<>"']/g, function (c) {
+            return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c];
+        });
+    };
+    var template = %s;
+    var origin = %s;
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {
+        icon: L.AwesomeMarkers.icon({icon: 'info-sign', markerColor: row[6], prefix: 'glyphicon'})
+    });
+    marker.bindTooltip(esc(row[2]) + ' (' + row[4] + ' km)');
+    marker.bindPopup(function () {
+        var dest = row[0] + ',' + row[1];
+        var fields = {name: row[2], type: row[3], dist: row[4], phone: row[5],
+                      maps: 'https://www.google.com/maps/search/?api=1&query=' + dest,
+                      dirs: 'https://www.google.com/maps/dir/?api=1&origin=' + origin + '&destination=' + dest};
+        return template.replace(/\\{(\\w+)\\}/g, function (_, k) { return esc(fields[k]); });
+    }, {maxWidth: 250});
+    return marker;
+}"""
+
+
+def _popup(row):
+    return POPUP_TEMPLATE.format(
+        name=html.escape(str(row['Name'])), type=html.escape(row['Type']), dist=row['Distance_km'],
+        phone=html.escape(str(row['Phone'])), maps=html.escape(row['Google_Maps']),
+        dirs=html.escape(row['Directions'])
+    )
+
+
+def build_map(results, user_loc, radius_km, cluster_threshold=CLUSTER_THRESHOLD):
+    """Folium map of a ResultSet; switches to client-side clustering for large result sets."""
+    # folium takes about a second to import; only pay for it once a map is drawn
+    import folium
+    from folium.plugins import FastMarkerCluster
+
+    m = folium.Map(location=user_loc, zoom_start=13)
+    folium.Marker(user_loc, popup="Your Location", icon=folium.Icon(color='red', icon='star', prefix='fa')).add_to(m)
+
+    if len(results) > cluster_threshold:
+        strings = results.strings
+        data = [[lat, lon, strings[text[0]], TYPES[code], dist, strings[text[2]], TYPE_COLORS.get(TYPES[code], 'gray')]
+                for lat, lon, text, code, dist in zip(results.lat.tolist(), results.lon.tolist(), results.text.tolist(),
+                                                      results.type_code.tolist(), results.dist.tolist())]
+        origin = json.dumps(f"{results.origin[0]},{results.origin[1]}")
+        FastMarkerCluster(data, callback=_CLUSTER_CALLBACK % (json.dumps(POPUP_TEMPLATE), origin)).add_to(m)
+    else:
+        for row in results:
+            folium.Marker([row['Latitude'], row['Longitude']], popup=folium.Popup(_popup(row), max_width=250),
+                          tooltip=f"{html.escape(str(row['Name']))} ({row['Distance_km']} km)",
+                          icon=folium.Icon(color=TYPE_COLORS.get(row['Type'], 'gray'), icon='info-sign')).add_to(m)
+
+    folium.Circle(user_loc, radius=radius_km*1000, color='#667eea', fill=True, fillOpacity=0.1).add_to(m)
+    return m
+
+
+def map_html(results, user_loc, radius_km, cluster_threshold=CLUSTER_THRESHOLD):
+    """Standalone HTML page for the map, ready for an iframe component."""
+    import folium
+
+    return folium.Figure().add_child(build_map(results, user_loc, radius_km, cluster_threshold)).render()
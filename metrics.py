@@ -0,0 +1,151 @@
+"""Counters, stage timings and per-search traces.
+
+Counters and stage durations accumulate in the process-wide `metrics`
+registry, rendered in the Prometheus text format by `metrics.prometheus()`.
+A search run inside `trace()` also keeps its own spans and counters, logged
+as one JSON line on the "search" logger when it ends (SEARCH_LOG=1 prints
+them to stderr).
+"""
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("search")
+if os.environ.get("SEARCH_LOG") == "1":
+    logger.addHandler(logging.StreamHandler(sys.stderr))
+    logger.setLevel(logging.INFO)
+
+_current = contextvars.ContextVar("search_trace", default=None)
+
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _series(name, labels):
+    if not labels:
+        return name
+    escaped = (v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in labels)
+    return name + '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + '}'
+
+
+class Metrics:
+    """Thread-safe counters and duration summaries keyed by name and labels."""
+
+    def __init__(self):
+        self.counters = {}
+        self.timings = {}
+        self.lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _labels(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        trace = _current.get()
+        if trace is not None:
+            trace.count(_series(*key), value)
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _labels(labels))
+        with self.lock:
+            total = self.timings.setdefault(key, [0.0, 0])
+            total[0] += seconds
+            total[1] += 1
+
+    def prometheus(self):
+        with self.lock:
+            counters = sorted(self.counters.items())
+            timings = sorted(self.timings.items())
+        lines, typed = [], set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{_series(name, labels)} {value}")
+        for (name, labels), (total, count) in timings:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} summary")
+            lines.append(f"{_series(name + '_sum', labels)} {total:.6f}")
+            lines.append(f"{_series(name + '_count', labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+class Trace:
+    """Spans and counters for one search, with times relative to its start."""
+
+    def __init__(self, name, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.started = time.time()
+        self.t0 = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def count(self, series, value):
+        with self.lock:
+            self.counters[series] = self.counters.get(series, 0) + value
+
+    def add_span(self, stage, start, end, attrs):
+        with self.lock:
+            self.spans.append({'stage': stage, 'start_ms': round((start - self.t0) * 1000, 1),
+                               'duration_ms': round((end - start) * 1000, 1), **attrs})
+
+    def to_dict(self):
+        duration = self.duration if self.duration is not None else time.perf_counter() - self.t0
+        with self.lock:
+            return {'search': self.name, **self.attrs, 'started': self.started,
+                    'duration_ms': round(duration * 1000, 1),
+                    'spans': sorted(self.spans, key=lambda s: s['start_ms']), 'counters': dict(self.counters)}
+
+
+@contextmanager
+def trace(name, **attrs):
+    """Collect the spans of one search; logs it as a JSON line on exit."""
+    current = Trace(name, **attrs)
+    token = _current.set(current)
+    try:
+        yield current
+    finally:
+        _current.reset(token)
+        current.duration = time.perf_counter() - current.t0
+        metrics.observe("search_seconds", current.duration, source=name)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(current.to_dict(), default=str))
+
+
+@contextmanager
+def span(stage, **attrs):
+    """Time a stage; yields a dict for attributes learned along the way (e.g. element counts)."""
+    extra = {}
+    start = time.perf_counter()
+    try:
+        yield extra
+    except BaseException as e:
+        extra['error'] = type(e).__name__
+        raise
+    finally:
+        end = time.perf_counter()
+        labels = {'stage': stage}
+        if 'type' in attrs:
+            labels['type'] = attrs['type']
+        metrics.observe("search_stage_seconds", end - start, **labels)
+        current = _current.get()
+        if current is not None:
+            current.add_span(stage, start, end, {**attrs, **extra})
+
+
+def swallowed(where, error):
+    """Record an exception that is handled by falling back rather than raised."""
+    metrics.inc("swallowed_errors_total", where=where, error=type(error).__name__)
+    logger.warning("%s failed: %r", where, error)
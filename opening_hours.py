@@ -0,0 +1,179 @@
+"""OSM opening_hours strings compiled to weekly minute masks.
+
+A string is parsed once into a boolean array over the 10080 minutes of a
+week (Monday 00:00 first) and cached, since a few dozen patterns cover most
+facilities. Whether a place is open at some time is then one array lookup,
+and a whole result set is evaluated per distinct string.
+
+The common subset of the syntax is understood: 24/7, weekday lists and ranges,
+time spans (past midnight too), ", " additional rules, "; " overriding rules,
+off/closed and comments. Rules for public or school holidays are skipped, as
+holidays aren't known here. Anything else (months, dates, week numbers,
+sunrise, open ends, fallback rules) leaves the hours unknown rather than guessed.
+"""
+import os
+import re
+from datetime import datetime
+from functools import lru_cache
+
+import numpy as np
+
+# Opening hours are local times; naive datetimes are taken to be in this zone
+HOURS_TZ = os.environ.get("HOURS_TZ", "Asia/Kolkata")
+
+OPEN, CLOSED, UNKNOWN = 1, 0, -1
+DAYS = ['Mo', 'Tu', 'We', 'Th', 'Fr', 'Sa', 'Su']
+DAY = 24 * 60
+WEEK = 7 * DAY
+
+_TOKEN = re.compile(r'\s*(?:(?P<always>24/7)|(?P<time>\d{1,2}:\d{2})|(?P<day>Mo|Tu|We|Th|Fr|Sa|Su)|'
+                    r'(?P<holiday>PH|SH)|(?P<mod>off|closed|open)|(?P<comment>"[^"]*")|(?P<punct>[-,;]))',
+                    re.IGNORECASE)
+
+
+def _tokens(text):
+    tokens, pos = [], 0
+    text = text.strip()
+    while pos < len(text):
+        m = _TOKEN.match(text, pos)
+        if m is None or m.end() == pos:
+            raise ValueError(text[pos:])
+        kind = m.lastgroup
+        value = m.group(kind)
+        tokens.append((kind, value.title() if kind == 'day' else value.lower() if kind != 'comment' else value))
+        pos = m.end()
+    return tokens
+
+
+def _minutes(value):
+    hours, minutes = value.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+class _Rules:
+    """Recursive descent over the tokens of one opening_hours string."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.i = 0
+
+    def peek(self, offset=0):
+        i = self.i + offset
+        return self.tokens[i] if i < len(self.tokens) else (None, None)
+
+    def take(self, kind, value=None):
+        token = self.peek()
+        if token[0] != kind or (value is not None and token[1] != value):
+            raise ValueError(f"expected {value or kind}")
+        self.i += 1
+        return token[1]
+
+    def days(self):
+        # None when there's no weekday selector (every day); an empty set for holiday-only selectors
+        if self.peek()[0] not in ('day', 'holiday'):
+            return None
+        days = set()
+        while True:
+            kind, value = self.peek()
+            self.i += 1
+            if kind == 'day':
+                start = DAYS.index(value)
+                end = start
+                if self.peek() == ('punct', '-'):
+                    self.i += 1
+                    end = DAYS.index(self.take('day'))
+                days.update(d % 7 for d in range(start, start + (end - start) % 7 + 1))
+            elif kind != 'holiday':
+                raise ValueError(value)
+            if self.peek() == ('punct', ',') and self.peek(1)[0] in ('day', 'holiday'):
+                self.i += 1
+                continue
+            return days
+
+    def spans(self):
+        spans = []
+        while self.peek()[0] == 'time':
+            start = _minutes(self.take('time'))
+            self.take('punct', '-')
+            end = _minutes(self.take('time'))
+            # "22:00-02:00" and "18:00-26:00" both run past midnight
+            spans.append((start, end if end > start else end + DAY))
+            if self.peek() == ('punct', ',') and self.peek(1)[0] == 'time':
+                self.i += 1
+                continue
+        return spans
+
+    def rules(self):
+        """(days, spans, closed, additional) per rule, in order."""
+        additional = False
+        while self.peek()[0] is not None:
+            if self.peek()[0] == 'always':
+                self.i += 1
+                days, spans = set(range(7)), [(0, DAY)]
+            else:
+                days = self.days()
+                spans = self.spans()
+                if days is None and not spans and self.peek()[0] != 'mod':
+                    raise ValueError("empty rule")
+            closed = False
+            if self.peek()[0] == 'mod':
+                closed = self.take('mod') in ('off', 'closed')
+            if self.peek()[0] == 'comment':
+                self.i += 1
+            yield (set(range(7)) if days is None else days), spans or [(0, DAY)], closed, additional
+            kind, value = self.peek()
+            if kind is None:
+                return
+            self.take('punct')
+            additional = value == ','
+
+
+@lru_cache(maxsize=4096)
+def compile_hours(text):
+    """Weekly open/closed mask for an opening_hours string, or None if it can't be understood."""
+    if not text or text == 'N/A':
+        return None
+    try:
+        rules = list(_Rules(_tokens(text)).rules())
+    except (ValueError, IndexError):
+        return None
+    if not any(days for days, *_ in rules):
+        # Only holiday rules ("PH off"): nothing is said about ordinary days
+        return None
+
+    # Each day's opening from its own midnight, up to 48 hours on, so a span past midnight belongs to the
+    # day it starts on: a later rule replaces what earlier ones said about its days, not the day before's spill
+    own = np.zeros((7, 2 * DAY), dtype=bool)
+    for days, spans, closed, additional in rules:
+        days = sorted(days)
+        if not additional or closed:
+            own[days] = False
+        if closed:
+            continue
+        for start, end in spans:
+            own[days, start:min(end, 2 * DAY)] = True
+
+    week = np.zeros(WEEK, dtype=bool)
+    for day in range(7):
+        week[(day * DAY + np.flatnonzero(own[day])) % WEEK] = True
+    week.flags.writeable = False
+    return week
+
+
+def minute_of_week(when=None):
+    """Minutes since Monday 00:00 local time (HOURS_TZ) at `when` (default now)."""
+    from zoneinfo import ZoneInfo
+
+    zone = ZoneInfo(HOURS_TZ)
+    if when is None:
+        when = datetime.now(zone)
+    elif when.tzinfo is not None:
+        when = when.astimezone(zone)
+    return when.weekday() * DAY + when.hour * 60 + when.minute
+
+
+def status_at(hours, when=None):
+    """OPEN, CLOSED or UNKNOWN for each opening_hours string at `when` (default now)."""
+    minute = minute_of_week(when)
+    masks = [compile_hours(text) for text in hours]
+    return np.array([UNKNOWN if mask is None else int(mask[minute]) for mask in masks], dtype=np.int8)
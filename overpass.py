@@ -0,0 +1,258 @@
+import json
+import re
+import threading
+import time
+
+OVERPASS_URL = "https://overpass-api.de/api/interpreter"
+
+# Service type -> OSM (key, value) tag it is mapped from
+SERVICE_TAGS = {
+    "Hospital": ("amenity", "hospital"), "Clinic": ("amenity", "clinic"),
+    "Pharmacy": ("amenity", "pharmacy"), "Doctors": ("amenity", "doctors"),
+    "Police Station": ("amenity", "police"), "Fire Station": ("amenity", "fire_station"),
+    "ATM": ("amenity", "atm"), "Embassy": ("amenity", "embassy"),
+    "Tourist Office": ("tourism", "information")
+}
+
+# Max elements returned per service type
+ELEMENT_CAP = 200
+
+# Tags element_fields and dedup read; the rest are dropped while a response is parsed
+RECORD_TAGS = ('name', 'name:en', 'brand', 'operator', 'phone', 'contact:phone', 'opening_hours',
+               'addr:housenumber', 'addr:street', 'addr:suburb', 'addr:locality', 'addr:city', 'addr:state',
+               'addr:full')
+KEEP_TAGS = tuple(dict.fromkeys([key for key, _ in SERVICE_TAGS.values()] + list(RECORD_TAGS)))
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token, returning how many seconds to wait before using it."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+
+    def acquire(self):
+        time.sleep(self.reserve())
+
+
+def tag_filter(r_type):
+    key, value = SERVICE_TAGS[r_type]
+    return f"[{key}={value}]"
+
+
+def around(lat, lon, radius_km):
+    return f"around:{radius_km*1000},{lat},{lon}"
+
+
+def bbox(south, west, north, east):
+    return f"{south},{west},{north},{east}"
+
+
+def _out(cap):
+    return f"out center {cap};" if cap else "out center;"
+
+
+def _union(r_type, areas):
+    tag = tag_filter(r_type)
+    return "(\n" + "\n".join(f"  nwr({area}){tag};" for area in areas) + "\n);"
+
+
+def _header(output, timeout):
+    # "json" returns every tag of an element, "csv" only its position (way/relation centre) and KEEP_TAGS
+    if output == "csv":
+        columns = ",".join(["::type", "::id", "::lat", "::lon"] + [f'"{tag}"' for tag in KEEP_TAGS])
+        return f'[out:csv({columns};true;"\\t")][timeout:{timeout}];'
+    return f"[out:json][timeout:{timeout}];"
+
+
+def type_query(r_type, areas, cap=ELEMENT_CAP, output="json"):
+    return f"{_header(output, 30)}\n{_union(r_type, areas)}\n{_out(cap)}"
+
+
+def combined_query(type_areas, cap=ELEMENT_CAP, output="json"):
+    # One union + output per type keeps the per-type cap inside a single request
+    parts = [f"{_union(t, areas)}\n{_out(cap)}" for t, areas in type_areas.items()]
+    return f"{_header(output, 60)}\n" + "\n".join(parts)
+
+
+def types_for(tags, types):
+    return [t for t in types if tags.get(SERVICE_TAGS[t][0]) == SERVICE_TAGS[t][1]]
+
+
+def split_elements(elements, types):
+    """Yield (type, element) pairs from a combined response, bucketed by tags."""
+    seen = set()
+    for elem in elements:
+        for r_type in types_for(elem.get('tags', {}), types):
+            key = (r_type, elem.get('type'), elem.get('id'))
+            if key in seen:
+                continue
+            seen.add(key)
+            yield r_type, elem
+
+
+def element_coords(elem):
+    if 'lat' in elem and 'lon' in elem:
+        return elem['lat'], elem['lon']
+    if 'center' in elem:
+        return elem['center']['lat'], elem['center']['lon']
+    return None
+
+
+def element_fields(elem, r_type):
+    """Display fields of an element: (name, address, phone, hours, lat, lon), or None if unusable."""
+    tags = elem.get('tags', {})
+
+    name = tags.get('name') or tags.get('name:en') or tags.get('brand') or tags.get('operator')
+    if not name:
+        city = tags.get('addr:city', '')
+        area = tags.get('addr:suburb', tags.get('addr:locality', ''))
+        if city or area:
+            name = f"{r_type} in {area or city}".strip()
+        else:
+            return None
+
+    coords = element_coords(elem)
+    if coords is None:
+        return None
+
+    phone = tags.get('phone', tags.get('contact:phone', 'N/A'))
+    hours = tags.get('opening_hours', 'N/A')
+
+    addr_parts = [tags.get(k, '') for k in ['addr:housenumber', 'addr:street', 'addr:suburb', 'addr:city', 'addr:state'] if tags.get(k)]
+    address = ', '.join(addr_parts) if addr_parts else tags.get('addr:full', 'N/A')
+
+    return name, address, phone, hours, coords[0], coords[1]
+
+
+def project(elem):
+    """The parts of an element the search uses: type, id, position and KEEP_TAGS."""
+    slim = {'type': elem.get('type'), 'id': elem.get('id')}
+    coords = element_coords(elem)
+    if coords is not None:
+        slim['lat'], slim['lon'] = coords
+    tags = elem.get('tags')
+    if tags:
+        slim['tags'] = {k: tags[k] for k in KEEP_TAGS if k in tags}
+    return slim
+
+
+_ELEMENTS = re.compile(r'"elements"\s*:\s*\[')
+_SKIP = re.compile(r'[\s,]*')
+
+
+class JSONElements:
+    """Incremental parser of an Overpass JSON response.
+
+    feed() takes text as it arrives and returns the projected elements it
+    completed, so only one element's full tags are in memory at a time;
+    close() checks the document ended properly and returns its remark.
+    """
+
+    def __init__(self):
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.in_elements = False
+        self.done = False
+
+    def feed(self, text):
+        buf = self.buf + text
+        pos = 0
+        elements = []
+        if not self.in_elements and not self.done:
+            match = _ELEMENTS.search(buf)
+            if match is None:
+                self.buf = buf
+                return elements
+            self.in_elements = True
+            pos = match.end()
+        while self.in_elements:
+            pos = _SKIP.match(buf, pos).end()
+            if pos == len(buf):
+                break
+            if buf[pos] == ']':
+                self.in_elements, self.done = False, True
+                pos += 1
+                break
+            try:
+                elem, end = self.decoder.raw_decode(buf, pos)
+            except ValueError:
+                # Cut off mid-element: wait for the rest
+                break
+            elements.append(project(elem))
+            pos = end
+        self.buf = buf[pos:]
+        return elements
+
+    def close(self):
+        if not self.done:
+            raise ValueError("response ended inside the element list")
+        tail = self.buf.strip()
+        if tail.startswith(','):
+            return json.loads("{" + tail[1:]).get('remark', '')
+        if tail != '}':
+            raise ValueError("unexpected data after the element list")
+        return ''
+
+
+class CSVElements:
+    """Incremental parser of the tab-separated response to a query built with output="csv".
+
+    Columns are read by their names in the header line, in whatever order the
+    server sends them; a header without the element columns raises ValueError.
+    """
+
+    def __init__(self):
+        self.buf = ""
+        self.header = None
+        self.columns = None
+        self.tag_columns = None
+        self.remark = ""
+
+    def feed(self, text):
+        lines = (self.buf + text).split('\n')
+        self.buf = lines.pop()
+        return [elem for elem in map(self._element, lines) if elem is not None]
+
+    def _element(self, line):
+        fields = line.rstrip('\r').split('\t')
+        if self.header is None:
+            self.header = fields
+            index = {name: i for i, name in enumerate(fields)}
+            missing = [c for c in ('@type', '@id', '@lat', '@lon') if c not in index]
+            if missing:
+                raise ValueError(f"CSV header lacks {', '.join(missing)}: {line[:200]!r}")
+            self.columns = [index[c] for c in ('@type', '@id', '@lat', '@lon')]
+            self.tag_columns = [(name, i) for name, i in index.items() if not name.startswith('@')]
+            return None
+        # Each output statement repeats the header; values with tabs or newlines can't be told apart
+        if fields == self.header or len(fields) != len(self.header):
+            if 'runtime error' in line:
+                self.remark = line
+            return None
+        elem_type, elem_id, lat, lon = (fields[i] for i in self.columns)
+        if not lat or not lon:
+            return None
+        tags = {k: fields[i] for k, i in self.tag_columns if fields[i]}
+        return {'type': elem_type, 'id': int(elem_id), 'lat': float(lat), 'lon': float(lon), 'tags': tags}
+
+    def close(self):
+        if self.buf:
+            self.feed('\n')
+        return self.remark
+
+
+def element_parser(content_type):
+    return CSVElements() if 'csv' in content_type else JSONElements()
@@ -0,0 +1,187 @@
+"""Offline POI index for the emergency finder.
+
+Build it ahead of time from an Overpass JSON dump or an OSM extract:
+
+    python poi_index.py india-latest.osm.pbf -o poi_index.npz
+    python poi_index.py overpass_dump.json -o poi_index.npz
+
+.osm.pbf input needs the optional `osmium` package (pip install osmium).
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+
+import numpy as np
+
+from dedup import dedupe
+from geo import arc_km, chord, unit_xyz
+from overpass import SERVICE_TAGS, element_fields, types_for
+from results import ResultSet
+
+TYPES = list(SERVICE_TAGS)
+STRING_COLUMNS = ['name', 'address', 'phone', 'hours']
+
+
+def build_index(elements, path, dedup_radius_m=100):
+    """Write every element matching a known service type to a columnar .npz store."""
+    by_type = {t: [] for t in TYPES}
+    for elem in elements:
+        for r_type in types_for(elem.get('tags', {}), TYPES):
+            by_type[r_type].append(elem)
+    if dedup_radius_m:
+        by_type = dedupe(by_type, dedup_radius_m)
+
+    rows = []
+    for code, r_type in enumerate(TYPES):
+        for elem in by_type[r_type]:
+            fields = element_fields(elem, r_type)
+            if fields is not None:
+                rows.append((code,) + fields)
+
+    # Dictionary-encode the string columns; phone/hours/address values repeat a lot
+    strings, codes = {}, {c: [] for c in STRING_COLUMNS}
+    for row in rows:
+        for col, value in zip(STRING_COLUMNS, row[1:5]):
+            codes[col].append(strings.setdefault(value, len(strings)))
+
+    # Strings live in one UTF-8 blob addressed by offsets
+    encoded = [s.encode('utf-8') for s in strings]
+    string_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=string_offsets[1:])
+
+    type_codes = np.array([row[0] for row in rows], dtype=np.uint8)
+    np.savez(
+        path,
+        types=np.array(TYPES),
+        offsets=np.searchsorted(type_codes, np.arange(len(TYPES) + 1)),
+        lat=np.array([row[5] for row in rows], dtype=np.float64),
+        lon=np.array([row[6] for row in rows], dtype=np.float64),
+        string_data=np.frombuffer(b''.join(encoded), dtype=np.uint8),
+        string_offsets=string_offsets,
+        **{col: np.array(codes[col], dtype=np.int32) for col in STRING_COLUMNS},
+    )
+    return len(rows)
+
+
+class POIIndex:
+    """Radius and k-nearest lookups over an index written by `build_index`."""
+
+    def __init__(self, path):
+        with np.load(path) as data:
+            self.types = [str(t) for t in data['types']]
+            self.offsets = data['offsets']
+            self.lat = data['lat']
+            self.lon = data['lon']
+            self.string_data = data['string_data'].tobytes()
+            self.string_offsets = data['string_offsets']
+            self.columns = {col: data[col] for col in STRING_COLUMNS}
+        self.trees = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.lat)
+
+    def _tree(self, r_type):
+        # KD-trees are built per type on first use
+        from scipy.spatial import cKDTree
+
+        with self.lock:
+            if r_type not in self.trees:
+                t = self.types.index(r_type)
+                start, end = self.offsets[t], self.offsets[t + 1]
+                xyz = unit_xyz(self.lat[start:end], self.lon[start:end])
+                self.trees[r_type] = (start, cKDTree(xyz) if end > start else None)
+            return self.trees[r_type]
+
+    def _string(self, code):
+        return self.string_data[self.string_offsets[code]:self.string_offsets[code + 1]].decode('utf-8')
+
+    def _records(self, r_type, rows, dists, lat, lon):
+        return ResultSet.from_rows((lat, lon), (
+            (r_type, *(self._string(self.columns[col][i]) for col in STRING_COLUMNS), float(self.lat[i]), float(self.lon[i]))
+            for i in rows
+        ), dists)
+
+    def radius(self, r_type, lat, lon, radius_km):
+        """Records of `r_type` within `radius_km`, nearest first."""
+        start, tree = self._tree(r_type)
+        if tree is None:
+            return ResultSet.empty((lat, lon))
+        centre = unit_xyz([lat], [lon])[0]
+        hits = np.array(tree.query_ball_point(centre, chord(radius_km)), dtype=np.intp)
+        if not len(hits):
+            return ResultSet.empty((lat, lon))
+        dists = arc_km(np.linalg.norm(tree.data[hits] - centre, axis=1))
+        order = np.argsort(dists)
+        return self._records(r_type, start + hits[order], dists[order], lat, lon)
+
+    def nearest(self, r_type, lat, lon, k, max_km=None):
+        """The `k` nearest records of `r_type`, optionally within `max_km`."""
+        start, tree = self._tree(r_type)
+        if tree is None or k <= 0:
+            return ResultSet.empty((lat, lon))
+        bound = chord(max_km) if max_km is not None else np.inf
+        dists, hits = tree.query(unit_xyz([lat], [lon])[0], k=min(k, tree.n), distance_upper_bound=bound)
+        dists, hits = np.atleast_1d(dists), np.atleast_1d(hits)
+        found = np.isfinite(dists)
+        return self._records(r_type, start + hits[found], arc_km(dists[found]), lat, lon)
+
+    def search(self, lat, lon, radius_km, selected_types):
+        return ResultSet.concat((self.radius(t, lat, lon, radius_km) for t in self.types if t in selected_types),
+                                (lat, lon))
+
+
+def read_overpass_json(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f).get('elements', [])
+
+
+def read_pbf(path):
+    try:
+        import osmium
+    except ImportError:
+        sys.exit("Reading .osm.pbf needs the osmium package: pip install osmium")
+
+    elements = []
+
+    class Handler(osmium.SimpleHandler):
+        def _keep(self, obj):
+            return any(obj.tags.get(k) == v for k, v in SERVICE_TAGS.values())
+
+        def node(self, n):
+            if self._keep(n):
+                elements.append({'type': 'node', 'id': n.id, 'lat': n.location.lat,
+                                 'lon': n.location.lon, 'tags': dict(n.tags)})
+
+        def way(self, w):
+            if not self._keep(w):
+                return
+            locs = [(nd.location.lat, nd.location.lon) for nd in w.nodes if nd.location.valid()]
+            if locs:
+                lat, lon = np.mean(locs, axis=0)
+                elements.append({'type': 'way', 'id': w.id, 'center': {'lat': float(lat), 'lon': float(lon)},
+                                 'tags': dict(w.tags)})
+
+    # Relations are skipped: their members need full multipolygon assembly
+    Handler().apply_file(path, locations=True)
+    return elements
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the offline POI index from an OSM extract or Overpass JSON dump.")
+    parser.add_argument("input", help=".osm.pbf extract or Overpass JSON ([out:json]) dump")
+    parser.add_argument("-o", "--output", default="poi_index.npz")
+    parser.add_argument("--dedup-m", type=float, default=100,
+                        help="merge same-named facilities closer than this many metres (0 disables)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    reader = read_pbf if args.input.endswith('.pbf') else read_overpass_json
+    count = build_index(reader(args.input), args.output, args.dedup_m)
+    print(f"Indexed {count} POIs into {args.output} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
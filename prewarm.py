@@ -0,0 +1,117 @@
+"""Background refresh of the caches for popular searches.
+
+Localities listed in PREWARM_PLACES (one per line, `#` comments) are geocoded
+and searched for every PREWARM_TYPES set and PREWARM_RADII radius, one after
+another on a background thread, so that the first user after a deploy or an
+expiry finds them cached. Each round refreshes the entries that would expire
+before the next one; requests go through the search core's rate limiters like
+any user search. Largest radii run first, so smaller ones reuse their tiles.
+"""
+import os
+import threading
+import time
+
+from metrics import metrics, swallowed, trace
+from search_core import RESULT_TTL, TILE_TTL
+
+PREWARM_PLACES = os.environ.get("PREWARM_PLACES", "")
+# Service type sets separated by ";" (default: the app's initial selection)
+PREWARM_TYPES = os.environ.get("PREWARM_TYPES", "Hospital,Police Station")
+PREWARM_RADII = os.environ.get("PREWARM_RADII", "10")
+# Seconds between refresh rounds; should stay well under the result and tile TTLs
+PREWARM_INTERVAL = float(os.environ.get("PREWARM_INTERVAL", str(min(RESULT_TTL, TILE_TTL) / 3)))
+# Pause between searches, leaving upstream capacity to users
+PREWARM_PAUSE = 1.0
+# Seconds of leeway on top of the interval for a round that starts late
+PREWARM_SLACK = 60.0
+
+
+def read_places(path):
+    with open(path, encoding='utf-8') as f:
+        lines = (line.split('#', 1)[0].strip() for line in f)
+        return [line for line in lines if line]
+
+
+def prewarm_entries(places, type_sets, radii):
+    """(place, types, radius) combinations, largest radius first."""
+    return [(place, types, radius) for place in places for radius in sorted(radii, reverse=True)
+            for types in type_sets]
+
+
+class Prewarmer:
+    """Keeps the searches in `entries` cached in `core`, refreshing them from a daemon thread."""
+
+    def __init__(self, core, entries, interval=PREWARM_INTERVAL, pause=PREWARM_PAUSE):
+        self.core = core
+        self.entries = entries
+        self.interval = interval
+        self.pause = pause
+        self.last_round = 0.0
+        self.state = {}
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="prewarm", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self):
+        while not self.stopped.is_set():
+            start = time.monotonic()
+            self.refresh_all()
+            self.last_round = time.monotonic() - start
+            self.stopped.wait(max(self.interval - self.last_round, 0))
+
+    def refresh_all(self):
+        # Whatever would expire before this entry's turn next round is fetched now; rounds start an
+        # interval apart, or back to back when one takes longer than that
+        fresh_for = max(self.interval, self.last_round) + PREWARM_SLACK
+        for entry in self.entries:
+            if self.stopped.is_set():
+                return
+            self.refresh(entry, fresh_for)
+            self.stopped.wait(self.pause)
+
+    def refresh(self, entry, fresh_for):
+        place, types, radius = entry
+        state = self.state.setdefault(entry, {'key': None, 'refreshed': None, 'error': None})
+        try:
+            with trace("prewarm", place=place, radius_km=radius, types=list(types)):
+                location = self.core.geocode_location(place, fresh_for=fresh_for)
+                if location is None:
+                    raise LookupError(f"no location for {place!r}")
+                state['key'] = self.core.result_key(location.latitude, location.longitude, radius, types)
+                self.core.fetch_resources(location.latitude, location.longitude, radius, types, fresh_for=fresh_for)
+        except Exception as e:
+            swallowed("prewarm", e)
+            metrics.inc("prewarm_refreshes_total", result="failed")
+            state['error'] = repr(e)
+            return
+        metrics.inc("prewarm_refreshes_total", result="ok")
+        state.update(refreshed=time.time(), error=None)
+
+    def status(self):
+        """One dict per entry: whether its search is cached now, and when it expires."""
+        rows = []
+        for entry in self.entries:
+            place, types, radius = entry
+            state = self.state.get(entry, {'key': None, 'refreshed': None, 'error': None})
+            age = self.core.result_cache.age(state['key']) if state['key'] else None
+            rows.append({'place': place, 'types': list(types), 'radius_km': radius, 'warm': age is not None,
+                         'refreshed': state['refreshed'],
+                         'expires_in_s': None if age is None else round(self.core.result_cache.ttl - age),
+                         'error': state['error']})
+        return rows
+
+
+def start_prewarm(core):
+    """Start refreshing the configured localities in `core`; returns the Prewarmer, or None if none are set."""
+    if not PREWARM_PLACES:
+        return None
+    type_sets = [tuple(t.strip() for t in group.split(",") if t.strip()) for group in PREWARM_TYPES.split(";")]
+    radii = [float(r) if "." in r else int(r) for r in PREWARM_RADII.split(",")]
+    entries = prewarm_entries(read_places(PREWARM_PLACES), [t for t in type_sets if t], radii)
+    return Prewarmer(core, entries).start()
@@ -0,0 +1,229 @@
+"""Columnar search results.
+
+A `ResultSet` keeps coordinates and distances in float arrays, the service
+type as a small integer code and the text fields as codes into one interned
+string table, so repeated values ("N/A", a shared street) are stored once.
+Google Maps and directions URLs are not stored at all; they are built for the
+rows that are actually rendered or exported. Sets ranked by drive time (see
+road_graph.py) carry an ETA_min column, NaN where no drive time was computed.
+Whether rows are open at a given time is evaluated per distinct Hours string
+(see opening_hours.py) and spread back to the rows.
+"""
+import numpy as np
+from geopy.distance import geodesic
+
+from geo import haversine_km
+from opening_hours import OPEN, UNKNOWN, status_at
+from overpass import SERVICE_TAGS
+
+TYPES = list(SERVICE_TAGS)
+TEXT_FIELDS = ['Name', 'Address', 'Phone', 'Hours']
+FIELDS = ['Name', 'Type', 'Distance_km', 'Address', 'Phone', 'Hours', 'Latitude', 'Longitude',
+          'Google_Maps', 'Directions']
+ETA_FIELDS = FIELDS[:3] + ['ETA_min'] + FIELDS[3:]
+
+MAPS_URL = "https://www.google.com/maps/search/?api=1&query={lat},{lon}"
+DIRECTIONS_URL = "https://www.google.com/maps/dir/?api=1&origin={olat},{olon}&destination={lat},{lon}"
+
+
+def maps_url(lat, lon):
+    return MAPS_URL.format(lat=lat, lon=lon)
+
+
+def directions_url(origin, lat, lon):
+    return DIRECTIONS_URL.format(olat=origin[0], olon=origin[1], lat=lat, lon=lon)
+
+
+class ResultSet:
+    """Results around `origin` as parallel columns; rows come out as dicts on demand."""
+
+    __slots__ = ('origin', 'type_code', 'lat', 'lon', 'dist', 'text', 'strings', 'eta')
+
+    def __init__(self, origin, type_code, lat, lon, dist, text, strings, eta=None):
+        self.origin = origin
+        self.type_code = type_code
+        self.lat = lat
+        self.lon = lon
+        self.dist = dist
+        self.text = text
+        self.strings = strings
+        self.eta = eta
+
+    @classmethod
+    def empty(cls, origin):
+        return cls(origin, np.empty(0, np.int8), np.empty(0), np.empty(0), np.empty(0),
+                   np.empty((0, len(TEXT_FIELDS)), np.int32), ())
+
+    @classmethod
+    def from_rows(cls, origin, rows, dist=None):
+        """Build from (type, name, address, phone, hours, lat, lon) tuples; distances are measured unless given."""
+        index, strings = {}, []
+
+        def intern(s):
+            code = index.get(s)
+            if code is None:
+                code = index[s] = len(strings)
+                strings.append(s)
+            return code
+
+        type_code, lat, lon, text = [], [], [], []
+        for r_type, name, address, phone, hours, rlat, rlon in rows:
+            type_code.append(TYPES.index(r_type))
+            lat.append(rlat)
+            lon.append(rlon)
+            text.append((intern(name), intern(address), intern(phone), intern(hours)))
+        if not type_code:
+            return cls.empty(origin)
+
+        results = cls(origin, np.array(type_code, np.int8), np.array(lat, float), np.array(lon, float), None,
+                      np.array(text, np.int32), tuple(strings))
+        if dist is None:
+            results.measure()
+        else:
+            results.dist = np.round(np.asarray(dist, float), 2)
+        return results
+
+    @classmethod
+    def concat(cls, sets, origin=None):
+        sets = [s for s in sets if len(s)]
+        if not sets:
+            return cls.empty(origin)
+        if len(sets) == 1:
+            return sets[0]
+        index, strings, texts = {}, [], []
+        for s in sets:
+            # Re-code the strings each set uses into one merged table
+            remap = np.zeros(len(s.strings), np.int32)
+            for code in np.unique(s.text):
+                value = s.strings[code]
+                if value not in index:
+                    index[value] = len(strings)
+                    strings.append(value)
+                remap[code] = index[value]
+            texts.append(remap[s.text])
+        eta = None
+        if any(s.eta is not None for s in sets):
+            eta = np.concatenate([np.full(len(s), np.nan) if s.eta is None else s.eta for s in sets])
+        return cls(sets[0].origin, np.concatenate([s.type_code for s in sets]),
+                   np.concatenate([s.lat for s in sets]), np.concatenate([s.lon for s in sets]),
+                   np.concatenate([s.dist for s in sets]), np.concatenate(texts), tuple(strings), eta)
+
+    def __len__(self):
+        return len(self.type_code)
+
+    def __repr__(self):
+        return f"<ResultSet of {len(self)} around {self.origin}>"
+
+    def measure(self):
+        """(Re)compute distances from the origin with a batched haversine."""
+        self.dist = np.round(haversine_km(self.origin[0], self.origin[1], self.lat, self.lon), 2)
+        return self
+
+    def recentred(self, origin):
+        """The same rows with distances (and directions) from another origin."""
+        return ResultSet(origin, self.type_code, self.lat, self.lon, None, self.text, self.strings).measure()
+
+    @property
+    def fields(self):
+        return FIELDS if self.eta is None else ETA_FIELDS
+
+    def take(self, idx):
+        """Rows at `idx` (indices or a boolean mask), sharing the string table."""
+        return ResultSet(self.origin, self.type_code[idx], self.lat[idx], self.lon[idx], self.dist[idx],
+                         self.text[idx], self.strings, None if self.eta is None else self.eta[idx])
+
+    def with_eta(self, eta):
+        return ResultSet(self.origin, self.type_code, self.lat, self.lon, self.dist, self.text, self.strings,
+                         np.asarray(eta, float))
+
+    def _order(self):
+        # Soonest first when drive times are known, then nearest
+        if self.eta is None:
+            return np.argsort(self.dist, kind='stable')
+        return np.lexsort((self.dist, np.nan_to_num(self.eta, nan=np.inf)))
+
+    def of_type(self, r_type):
+        return self.take(self.type_code == TYPES.index(r_type))
+
+    def type_names(self):
+        return [TYPES[c] for c in np.unique(self.type_code)]
+
+    def sorted(self):
+        return self.take(self._order())
+
+    def sorted_within_types(self):
+        """Sorted per type, types kept in SERVICE_TAGS order."""
+        order = self._order()
+        return self.take(order[np.argsort(self.type_code[order], kind='stable')])
+
+    def open_at(self, when=None):
+        """OPEN, CLOSED or UNKNOWN per row at `when` (default now)."""
+        codes, inverse = np.unique(self.text[:, 3], return_inverse=True)
+        return status_at([self.strings[c] for c in codes], when)[inverse]
+
+    def open_only(self, when=None):
+        return self.take(self.open_at(when) == OPEN)
+
+    def open_first(self, when=None):
+        """Open rows first, then those with unknown hours, then closed ones; otherwise in order."""
+        status = self.open_at(when)
+        return self.take(np.argsort(np.where(status == OPEN, 0, np.where(status == UNKNOWN, 1, 2)), kind='stable'))
+
+    def ranked(self, radius_km, cap=None, exact_top_n=0):
+        """Nearest first within `radius_km`, at most `cap` per type, grouped in SERVICE_TAGS order.
+
+        The first `exact_top_n` of each type get exact geodesic distances.
+        """
+        parts = []
+        for code in np.unique(self.type_code):
+            idx = np.flatnonzero((self.type_code == code) & (self.dist <= radius_km))
+            idx = idx[np.argsort(self.dist[idx], kind='stable')][:cap]
+            part = self.take(idx)
+            if exact_top_n and len(part):
+                part.dist = part.dist.copy()
+                for i in range(min(exact_top_n, len(part))):
+                    part.dist[i] = round(geodesic(self.origin, (part.lat[i], part.lon[i])).km, 2)
+                part = part.sorted()
+            parts.append(part)
+        return ResultSet.concat(parts, self.origin)
+
+    def nearest_km(self):
+        return float(self.dist.min()) if len(self) else None
+
+    def row(self, i):
+        lat, lon = float(self.lat[i]), float(self.lon[i])
+        name, address, phone, hours = (self.strings[c] for c in self.text[i])
+        row = {'Name': name, 'Type': TYPES[self.type_code[i]], 'Distance_km': float(self.dist[i])}
+        if self.eta is not None:
+            row['ETA_min'] = None if np.isnan(self.eta[i]) else float(self.eta[i])
+        row.update({'Address': address, 'Phone': phone, 'Hours': hours, 'Latitude': lat, 'Longitude': lon,
+                    'Google_Maps': maps_url(lat, lon), 'Directions': directions_url(self.origin, lat, lon)})
+        return row
+
+    def records(self, limit=None):
+        """Row dicts, URLs included, for the first `limit` rows."""
+        return [self.row(i) for i in range(len(self) if limit is None else min(limit, len(self)))]
+
+    def __iter__(self):
+        return (self.row(i) for i in range(len(self)))
+
+    def to_frame(self, urls=True):
+        import pandas as pd
+
+        strings = np.array(self.strings, dtype=object)
+        df = pd.DataFrame({
+            'Name': strings[self.text[:, 0]],
+            'Type': pd.Categorical.from_codes(self.type_code, TYPES),
+            'Distance_km': self.dist,
+            **({} if self.eta is None else {'ETA_min': self.eta}),
+            'Address': strings[self.text[:, 1]],
+            'Phone': strings[self.text[:, 2]],
+            'Hours': strings[self.text[:, 3]],
+            'Latitude': self.lat,
+            'Longitude': self.lon,
+        })
+        if urls:
+            lats, lons = self.lat.tolist(), self.lon.tolist()
+            df['Google_Maps'] = [maps_url(a, b) for a, b in zip(lats, lons)]
+            df['Directions'] = [directions_url(self.origin, a, b) for a, b in zip(lats, lons)]
+        return df
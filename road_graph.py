@@ -0,0 +1,249 @@
+"""Drive-time routing graph for ranking results by travel time.
+
+Build it ahead of time from an OSM extract or an Overpass JSON dump of the roads
+([out:json]; way[highway](bbox); (._;>;); out body;):
+
+    python road_graph.py delhi-latest.osm.pbf -o road_graph.npz
+    python road_graph.py roads.json -o road_graph.npz
+
+Junctions and dead ends become graph nodes, plus a shape point at least every
+MAX_EDGE_M along a road so points snap close to where they are; the other
+shape points are folded into edge lengths. Edges cost seconds at a speed per
+road class and follow oneway rules; only the largest strongly connected part
+is kept, so every node can reach every other. A search runs one Dijkstra from
+the user's point, cut off at a cost no realistic route to its furthest
+candidate exceeds, and every service type whose candidates it covers reads
+their times from it. .osm.pbf input needs the optional `osmium` package
+(pip install osmium).
+"""
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+from geo import arc_km, haversine_km, unit_xyz
+
+# Typical urban driving speeds (km/h) per highway class; other classes aren't drivable
+SPEEDS_KMH = {
+    'motorway': 80, 'motorway_link': 40, 'trunk': 60, 'trunk_link': 35, 'primary': 45, 'primary_link': 30,
+    'secondary': 35, 'secondary_link': 25, 'tertiary': 30, 'tertiary_link': 20, 'unclassified': 25,
+    'residential': 20, 'living_street': 10, 'service': 15, 'road': 20, 'track': 10,
+}
+MAX_EDGE_M = 250
+# Speed from a point to the road it snaps to, also taken as the slowest plausible average
+SNAP_KMH = 15
+# Searches stop at the time the furthest candidate takes at SNAP_KMH over this multiple of the straight line
+DETOUR = 2.5
+
+
+def speed_kmh(tags):
+    if tags.get('access') in ('no', 'private') or tags.get('motor_vehicle') == 'no':
+        return None
+    speed = SPEEDS_KMH.get(tags.get('highway'))
+    maxspeed = tags.get('maxspeed', '')
+    if speed and maxspeed.isdigit():
+        speed = min(speed, int(maxspeed))
+    return speed
+
+
+def direction(tags):
+    """1 for oneway along the way, -1 against it, 0 for both directions."""
+    oneway = tags.get('oneway')
+    if oneway in ('yes', 'true', '1'):
+        return 1
+    if oneway in ('-1', 'reverse'):
+        return -1
+    if oneway is None and (tags.get('highway') == 'motorway' or tags.get('junction') == 'roundabout'):
+        return 1
+    return 0
+
+
+def build_graph(ways, path, max_edge_m=MAX_EDGE_M):
+    """Write a CSR routing graph from (node ids, lats, lons, tags) ways; returns (nodes, edges).
+
+    Raises ValueError if there are no drivable roads.
+    """
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    ways = [(ids, lats, lons, speed_kmh(tags), direction(tags)) for ids, lats, lons, tags in ways
+            if len(ids) > 1 and speed_kmh(tags)]
+    # Nodes used by more than one way (or twice by one) and way ends are junctions
+    uses = Counter()
+    for ids, *_ in ways:
+        uses.update(ids)
+        uses.update((ids[0], ids[-1]))
+
+    index, lat, lon = {}, [], []
+    edges = []
+
+    def node(osm_id, la, lo):
+        n = index.get(osm_id)
+        if n is None:
+            n = index[osm_id] = len(lat)
+            lat.append(la)
+            lon.append(lo)
+        return n
+
+    for ids, lats, lons, speed, way_dir in ways:
+        seg_m = haversine_km(lats[:-1], lons[:-1], lats[1:], lons[1:]) * 1000
+        start, length = 0, 0.0
+        for i in range(1, len(ids)):
+            length += seg_m[i - 1]
+            if uses[ids[i]] > 1 or i == len(ids) - 1 or length >= max_edge_m:
+                a, b = node(ids[start], lats[start], lons[start]), node(ids[i], lats[i], lons[i])
+                # Never zero: a stored zero would read as "no edge"
+                seconds = max(length / (speed / 3.6), 0.1)
+                if way_dir >= 0:
+                    edges.append((a, b, seconds))
+                if way_dir <= 0:
+                    edges.append((b, a, seconds))
+                start, length = i, 0.0
+
+    if not edges:
+        raise ValueError("no drivable roads in the input (highway ways of a known class with their nodes)")
+    edges = np.array(edges, dtype=float).reshape(-1, 3)
+    src, dst, cost = edges[:, 0].astype(np.int64), edges[:, 1].astype(np.int64), edges[:, 2]
+    # Parallel edges keep the fastest
+    order = np.lexsort((cost, dst, src))
+    src, dst, cost = src[order], dst[order], cost[order]
+    first = np.ones(len(src), bool)
+    first[1:] = (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])
+    src, dst, cost = src[first], dst[first], cost[first]
+
+    n = len(lat)
+    _, labels = connected_components(csr_matrix((cost, (src, dst)), shape=(n, n)), connection='strong')
+    keep = labels == np.bincount(labels).argmax()
+    renumber = np.cumsum(keep) - 1
+    kept = keep[src] & keep[dst]
+    graph = csr_matrix((cost[kept], (renumber[src[kept]], renumber[dst[kept]])), shape=(keep.sum(),) * 2)
+    np.savez(path, lat=np.array(lat)[keep], lon=np.array(lon)[keep], indptr=graph.indptr, indices=graph.indices,
+             cost=graph.data)
+    return graph.shape[0], graph.nnz
+
+
+class RoadGraph:
+    """Drive times over a graph written by `build_graph`."""
+
+    def __init__(self, path):
+        from scipy.sparse import csr_matrix
+        from scipy.spatial import cKDTree
+
+        with np.load(path) as data:
+            self.lat = data['lat']
+            self.lon = data['lon']
+            n = len(self.lat)
+            self.graph = csr_matrix((data['cost'], data['indices'], data['indptr']), shape=(n, n))
+        self.tree = cKDTree(unit_xyz(self.lat, self.lon))
+
+    def __len__(self):
+        return len(self.lat)
+
+    def snap(self, lats, lons):
+        """(nearest graph node, km to it) for each point."""
+        chords, nodes = self.tree.query(unit_xyz(lats, lons))
+        return nodes, arc_km(chords)
+
+    def drive_times(self, origin, within_km):
+        """`DriveTimes` from `origin` to anywhere up to `within_km` away in a straight line."""
+        return DriveTimes(self, origin, within_km)
+
+    def travel_times(self, origin, lats, lons):
+        """Seconds to drive from `origin` to each point; inf if not reachable within the cut-off."""
+        if not len(lats):
+            return np.empty(0)
+        furthest_km = float(haversine_km(origin[0], origin[1], lats, lons).max())
+        return self.drive_times(origin, furthest_km).to(lats, lons)
+
+    def rank(self, results, top_n, routes=None):
+        """`results` (nearest first per type) with drive times for the `top_n` nearest of each type,
+        re-ranked soonest first; rows without a drive time follow by distance.
+
+        `routes` is a dict kept for one search: its DriveTimes is reused while it reaches the
+        candidates, and replaced by a longer one when they lie further out.
+        """
+        candidates = np.concatenate([np.flatnonzero(results.type_code == c)[:top_n]
+                                     for c in np.unique(results.type_code)])
+        eta = np.full(len(results), np.nan)
+        furthest_km = float(results.dist[candidates].max()) if len(candidates) else 0.0
+        routes = {} if routes is None else routes
+        times = routes.get('drive_times')
+        if times is None or times.within_km < furthest_km:
+            times = routes['drive_times'] = self.drive_times(results.origin, furthest_km)
+        seconds = times.to(results.lat[candidates], results.lon[candidates])
+        eta[candidates] = np.where(np.isfinite(seconds), np.round(seconds / 60, 1), np.nan)
+        return results.with_eta(eta).sorted_within_types()
+
+
+class DriveTimes:
+    """Seconds to drive from one point, from a single Dijkstra over the graph."""
+
+    def __init__(self, graph, origin, within_km):
+        from scipy.sparse.csgraph import dijkstra
+
+        self.graph = graph
+        self.within_km = within_km
+        (source,), (self.source_km,) = graph.snap([origin[0]], [origin[1]])
+        limit = (within_km * DETOUR + 1) / SNAP_KMH * 3600
+        self.seconds = dijkstra(graph.graph, indices=source, limit=limit)
+
+    def to(self, lats, lons):
+        """Seconds to each point; inf if not reachable within the cut-off."""
+        if not len(lats):
+            return np.empty(0)
+        targets, target_km = self.graph.snap(lats, lons)
+        return self.seconds[targets] + (self.source_km + target_km) / SNAP_KMH * 3600
+
+
+def read_overpass_json(path):
+    with open(path, encoding='utf-8') as f:
+        elements = json.load(f).get('elements', [])
+    coords = {e['id']: (e['lat'], e['lon']) for e in elements if e.get('type') == 'node'}
+    for e in elements:
+        if e.get('type') == 'way' and 'highway' in e.get('tags', {}):
+            ids = [i for i in e.get('nodes', []) if i in coords]
+            yield ids, np.array([coords[i][0] for i in ids]), np.array([coords[i][1] for i in ids]), e['tags']
+
+
+def read_pbf(path):
+    try:
+        import osmium
+    except ImportError:
+        sys.exit("Reading .osm.pbf needs the osmium package: pip install osmium")
+
+    ways = []
+
+    class Handler(osmium.SimpleHandler):
+        def way(self, w):
+            if w.tags.get('highway') not in SPEEDS_KMH:
+                return
+            nodes = [nd for nd in w.nodes if nd.location.valid()]
+            ways.append(([nd.ref for nd in nodes], np.array([nd.location.lat for nd in nodes]),
+                         np.array([nd.location.lon for nd in nodes]), dict(w.tags)))
+
+    Handler().apply_file(path, locations=True)
+    return ways
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the drive-time routing graph from an OSM extract or Overpass JSON dump.")
+    parser.add_argument("input", help=".osm.pbf extract or Overpass JSON dump of highway ways and their nodes")
+    parser.add_argument("-o", "--output", default="road_graph.npz")
+    parser.add_argument("--max-edge-m", type=float, default=MAX_EDGE_M,
+                        help="split longer road segments so points snap within half this distance")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    reader = read_pbf if args.input.endswith('.pbf') else read_overpass_json
+    try:
+        nodes, edges = build_graph(reader(args.input), args.output, args.max_edge_m)
+    except ValueError as e:
+        sys.exit(f"{args.input}: {e}")
+    print(f"Built a graph of {nodes} nodes and {edges} edges into {args.output} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+"""Search pipeline shared by the Streamlit app and the JSON API.
+
+Geocoding, Overpass/offline lookups, caching and ranking live here with no
+Streamlit dependency, configured from environment variables.
+"""
+import os
+import time
+
+from dedup import dedupe, related_types
+from fetch_engine import NOMINATIM_URL as DEFAULT_NOMINATIM_URL, FetchEngine, FetchError
+from gazetteer import Gazetteer
+from geocode_cache import GeocodeCache, normalize_query
+from metrics import metrics, span, swallowed
+from overpass import (OVERPASS_URL, SERVICE_TAGS, ELEMENT_CAP, TokenBucket, around, bbox,
+                      type_query, combined_query, split_elements, element_fields)
+from poi_index import POIIndex
+from results import ResultSet
+from road_graph import RoadGraph
+from singleflight import SingleFlight
+from tile_cache import TileCache, covering_tiles, tile_spans
+from ttl_cache import TTLCache
+
+# "live" queries Overpass, "offline" reads a prebuilt index (see poi_index.py)
+POI_SOURCE = os.environ.get("POI_SOURCE", "live")
+POI_INDEX_PATH = os.environ.get("POI_INDEX_PATH", "poi_index.npz")
+
+# One union query for all selected types instead of one request per type
+OVERPASS_COMBINED = os.environ.get("OVERPASS_COMBINED", "1") == "1"
+# Per-type requests run concurrently, sharing one rate limit to Overpass
+OVERPASS_WORKERS = int(os.environ.get("OVERPASS_WORKERS", "4"))
+OVERPASS_RATE = float(os.environ.get("OVERPASS_RATE", "2"))
+# Mirrors are tried in order; failing ones are skipped by a circuit breaker
+OVERPASS_MIRRORS = os.environ.get("OVERPASS_MIRRORS", f"{OVERPASS_URL},https://overpass.kumi.systems/api/interpreter").split(",")
+OVERPASS_REQUEST_TIMEOUT = float(os.environ.get("OVERPASS_REQUEST_TIMEOUT", "35"))
+OVERPASS_RETRIES = int(os.environ.get("OVERPASS_RETRIES", "3"))
+# Seconds before a slow request is duplicated onto the next mirror (empty disables)
+OVERPASS_HEDGE_AFTER = float(os.environ.get("OVERPASS_HEDGE_AFTER", "10") or 0) or None
+# "csv" asks Overpass for only the position and tags a result needs instead of every tag
+OVERPASS_OUTPUT = os.environ.get("OVERPASS_OUTPUT", "json")
+SEARCH_DEADLINE = float(os.environ.get("SEARCH_DEADLINE", "60"))
+# Nominatim usage policy: at most 1 request per second
+NOMINATIM_URL = os.environ.get("NOMINATIM_URL", DEFAULT_NOMINATIM_URL)
+NOMINATIM_RATE = 1
+
+# Same-named facilities closer than this (metres) are merged into one result; 0 disables
+DEDUP_RADIUS_M = float(os.environ.get("DEDUP_RADIUS_M", "100"))
+
+# Search radii (km) offered by the app and accepted by the API; the largest also bounds nearest-K searches
+RADII = [2, 5, 10, 15, 20, 30]
+# Nearest-K searches start at this radius (km) and grow it by NEAREST_GROWTH per ring
+NEAREST_K = int(os.environ.get("NEAREST_K", "5"))
+NEAREST_START_KM = float(os.environ.get("NEAREST_START_KM", "2"))
+NEAREST_GROWTH = 2
+
+# Gazetteer built with gazetteer.py; when set, places it knows are geocoded locally and the app suggests places
+GAZETTEER_PATH = os.environ.get("GAZETTEER_PATH", "")
+
+# Road graph built with road_graph.py; when set, the nearest ETA_TOP_N per type are ranked by drive time
+ROAD_GRAPH_PATH = os.environ.get("ROAD_GRAPH_PATH", "")
+ETA_TOP_N = int(os.environ.get("ETA_TOP_N", "50"))
+
+# Distances use a batched haversine; the nearest N per type get exact geodesic values
+EXACT_DISTANCE_TOP_N = int(os.environ.get("EXACT_DISTANCE_TOP_N", "3"))
+
+# Overpass results cached per map tile, so nearby and resized searches reuse them
+TILE_CACHE = os.environ.get("TILE_CACHE", "1") == "1"
+TILE_ZOOM = int(os.environ.get("TILE_ZOOM", "12"))
+TILE_TTL = int(os.environ.get("TILE_TTL", "1800"))
+TILE_CACHE_SIZE = int(os.environ.get("TILE_CACHE_SIZE", "200000"))
+
+# Seconds an assembled search result is reused
+RESULT_TTL = 1800
+
+# Identical concurrent lookups wait this long (seconds) for the first one instead of going upstream too
+COALESCE_WAIT = float(os.environ.get("COALESCE_WAIT", str(SEARCH_DEADLINE)))
+# Times a caller waits on a failing lookup before going upstream itself
+COALESCE_ROUNDS = 2
+
+# Shared on-disk geocode cache; point replicas at the same file
+GEOCODE_CACHE_PATH = os.environ.get("GEOCODE_CACHE_PATH", "geocode_cache.sqlite3")
+GEOCODE_CACHE_TTL = int(os.environ.get("GEOCODE_CACHE_TTL", str(30 * 86400)))
+GEOCODE_CACHE_SIZE = int(os.environ.get("GEOCODE_CACHE_SIZE", "100000"))
+
+
+class SearchCore:
+    """Holds the shared limiters, engine and caches; create one per process."""
+
+    def __init__(self):
+        self.overpass_limiter = TokenBucket(rate=OVERPASS_RATE, capacity=OVERPASS_WORKERS)
+        self.nominatim_limiter = TokenBucket(rate=NOMINATIM_RATE)
+        self.engine = FetchEngine(
+            OVERPASS_MIRRORS, self.overpass_limiter, self.nominatim_limiter, nominatim_url=NOMINATIM_URL,
+            request_timeout=OVERPASS_REQUEST_TIMEOUT, retries=OVERPASS_RETRIES, hedge_after=OVERPASS_HEDGE_AFTER, concurrency=OVERPASS_WORKERS
+        )
+        self.geocode_cache = GeocodeCache(GEOCODE_CACHE_PATH, ttl=GEOCODE_CACHE_TTL, max_entries=GEOCODE_CACHE_SIZE)
+        self.tile_cache = TileCache(zoom=TILE_ZOOM, ttl=TILE_TTL, max_elements=TILE_CACHE_SIZE)
+        self.result_cache = TTLCache(ttl=RESULT_TTL, max_entries=512)
+        self.flights = SingleFlight()
+        self._poi_index = None
+        self._road_graph = None
+        self._gazetteer = None
+
+    @property
+    def poi_index(self):
+        if self._poi_index is None:
+            self._poi_index = POIIndex(POI_INDEX_PATH)
+        return self._poi_index
+
+    @property
+    def road_graph(self):
+        if self._road_graph is None:
+            self._road_graph = RoadGraph(ROAD_GRAPH_PATH)
+        return self._road_graph
+
+    @property
+    def gazetteer(self):
+        if self._gazetteer is None:
+            self._gazetteer = Gazetteer(GAZETTEER_PATH)
+        return self._gazetteer
+
+    def suggest_places(self, text, limit=8):
+        return self.gazetteer.suggest(text, limit) if GAZETTEER_PATH else []
+
+    def geocode_location(self, place_name, fresh_for=0):
+        """Geocode `place_name`, or None if there's no such place; raises FetchError if Nominatim failed.
+
+        Cached answers expiring within `fresh_for` seconds are looked up again.
+        """
+        key = normalize_query(place_name)
+        if GAZETTEER_PATH:
+            location = self.gazetteer.geocode(key)
+            metrics.inc("cache_requests_total", cache="gazetteer", result="miss" if location is None else "hit")
+            if location is not None:
+                return location
+        for attempt in range(COALESCE_ROUNDS + 1):
+            try:
+                location = self.geocode_cache.get(key, fresh_for)
+            except KeyError:
+                metrics.inc("cache_requests_total", cache="geocode", result="miss")
+            else:
+                metrics.inc("cache_requests_total", cache="geocode", result="hit")
+                return location
+            if attempt == COALESCE_ROUNDS:
+                return self._geocode(key)
+            # Concurrent lookups of the same place wait for the first one to fill the cache
+            with self.flights.lead("geocode", key, COALESCE_WAIT) as leader:
+                if leader:
+                    return self._geocode(key)
+
+    def _geocode(self, key):
+        try:
+            with span("geocode"):
+                location = self.engine.geocode(key + ", India")
+        except FetchError:
+            # Upstream errors are not cached
+            raise
+        except Exception as e:
+            raise FetchError(f"geocoding {key!r} failed: {e!r}") from e
+        self.geocode_cache.set(key, location)
+        return location
+
+    def rank_records(self, results, radius_km, routes=None):
+        # Nearest first within the radius, capped per type; then soonest first by road if there's a graph.
+        # `routes` is a dict kept for one search, so its types share a Dijkstra (see RoadGraph.rank)
+        ranked = results.ranked(radius_km, ELEMENT_CAP, EXACT_DISTANCE_TOP_N)
+        if ROAD_GRAPH_PATH and len(ranked):
+            with span("eta", candidates=min(len(ranked), ETA_TOP_N)):
+                ranked = self.road_graph.rank(ranked, ETA_TOP_N, routes)
+        return ranked
+
+    def result_key(self, lat, lon, radius_km, selected_types, combined=OVERPASS_COMBINED):
+        types = tuple(t for t in SERVICE_TAGS if t in selected_types)
+        return lat, lon, radius_km, types, combined, POI_SOURCE
+
+    def stream_resources(self, lat, lon, radius_km, selected_types, combined=OVERPASS_COMBINED, on_progress=None,
+                         on_error=None, fresh_for=0, deadline=None):
+        """Yield (type, ResultSet) batches, nearest first, as each service type becomes available.
+
+        Related types (dedup.RELATED_TYPES) are yielded together once all of them are,
+        so duplicates across them are merged the same way on every search.
+
+        `on_progress(text, fraction)` is called as upstream requests go out and complete;
+        `on_error(type, error)` when a type's request fails and only cached records are yielded.
+        Cached results and tiles expiring within `fresh_for` seconds are fetched again.
+        Upstream requests stop at `deadline` (time.monotonic()), by default SEARCH_DEADLINE from now.
+        """
+        if deadline is None:
+            deadline = time.monotonic() + SEARCH_DEADLINE
+        key = self.result_key(lat, lon, radius_km, selected_types, combined)
+        for attempt in range(COALESCE_ROUNDS + 1):
+            cached = self.result_cache.get(key, fresh_for=fresh_for)
+            metrics.inc("cache_requests_total", cache="result", result="miss" if cached is None else "hit")
+            if cached is not None:
+                for r_type in key[3]:
+                    yield r_type, cached[r_type]
+                return
+            if attempt == COALESCE_ROUNDS:
+                yield from self._stream_resources(key, on_progress, on_error, fresh_for, deadline)
+                return
+            # Concurrent identical searches wait for the first one to fill the result cache
+            with self.flights.lead("search", key, COALESCE_WAIT) as leader:
+                if leader:
+                    yield from self._stream_resources(key, on_progress, on_error, fresh_for, deadline)
+                    return
+
+    def _stream_resources(self, key, on_progress, on_error, fresh_for, deadline):
+        lat, lon, radius_km, types, combined, _ = key
+        progress = on_progress or (lambda text, fraction: None)
+        batches = {}
+        routes = {}
+
+        if POI_SOURCE == "offline":
+            for r_type in types:
+                with span("index", type=r_type) as extra:
+                    found = self.poi_index.radius(r_type, lat, lon, radius_km)
+                    batches[r_type] = self.rank_records(found, radius_km, routes)
+                    extra['results'] = len(batches[r_type])
+                yield r_type, batches[r_type]
+            self.result_cache.set(key, batches)
+            return
+
+        def ready(r_type):
+            with span("rank", type=r_type) as extra:
+                elems = elements[r_type]
+                if DEDUP_RADIUS_M:
+                    # Every related type is in by now (see settle), so the group is merged once, in full
+                    group = tuple(t for t in related_types(r_type) if t in elements)
+                    if group not in deduped:
+                        deduped[group] = dedupe({t: elements[t] for t in group}, DEDUP_RADIUS_M)
+                    elems = deduped[group][r_type]
+                    metrics.inc("dedup_merged_total", max(len(elements[r_type]) - len(elems), 0), type=r_type)
+                fields = (element_fields(e, r_type) for e in elems)
+                parsed = ResultSet.from_rows((lat, lon), ((r_type, *f) for f in fields if f))
+                batches[r_type] = self.rank_records(parsed, radius_km, routes)
+                extra['elements'] = len(elements[r_type])
+                extra['results'] = len(batches[r_type])
+            return r_type, batches[r_type]
+
+        def settle(r_type):
+            # A type is ranked once its related types are all in too, so which of them merge
+            # doesn't depend on which response lands first
+            settled.add(r_type)
+            group = [t for t in related_types(r_type) if t in elements] if DEDUP_RADIUS_M else [r_type]
+            if settled.issuperset(group):
+                for t in group:
+                    yield ready(t)
+
+        def store(r_type, elems):
+            metrics.inc("overpass_elements_total", len(elems), type=r_type)
+            if TILE_CACHE:
+                elems = self.tile_cache.store(r_type, missing[r_type], elems)
+            elements[r_type].extend(elems)
+
+        elements = {t: [] for t in types}
+        deduped = {}
+        settled, failed = set(), set()
+
+        if TILE_CACHE:
+            # Only fetch the tiles under the search circle that aren't cached yet
+            zoom = self.tile_cache.zoom
+            tiles = covering_tiles(lat, lon, radius_km, zoom)
+            missing = {}
+            for r_type in types:
+                elements[r_type], missing[r_type] = self.tile_cache.split(r_type, tiles, fresh_for)
+                metrics.inc("cache_requests_total", len(tiles) - len(missing[r_type]), cache="tile", result="hit")
+                metrics.inc("cache_requests_total", len(missing[r_type]), cache="tile", result="miss")
+            type_areas = {t: [bbox(*b) for b in tile_spans(m, zoom)] for t, m in missing.items() if m}
+            cap = None
+        else:
+            type_areas = {t: [around(lat, lon, radius_km)] for t in types}
+            cap = ELEMENT_CAP
+
+        # Fully cached types can be shown right away
+        for r_type in types:
+            if r_type not in type_areas:
+                yield from settle(r_type)
+
+        pending = list(type_areas)
+
+        if combined and len(pending) > 1:
+            progress("Searching all services...", 0.0)
+
+            try:
+                with span("overpass", type="combined") as extra:
+                    data = self.engine.query(combined_query(type_areas, cap, OVERPASS_OUTPUT), deadline)
+                    extra['elements'] = len(data)
+            except FetchError as e:
+                # Fall back to one request per type
+                swallowed("overpass_combined", e)
+                data = None
+
+            if data is not None:
+                fetched = {t: [] for t in pending}
+                for r_type, elem in split_elements(data, pending):
+                    fetched[r_type].append(elem)
+                for r_type in pending:
+                    store(r_type, fetched[r_type])
+                for r_type in pending:
+                    yield from settle(r_type)
+                pending = []
+
+        if pending:
+            text = f"Searching {', '.join(pending)}..."
+            progress(text, 0.0)
+            queries = {t: type_query(t, type_areas[t], cap, OVERPASS_OUTPUT) for t in pending}
+            for idx, (r_type, data) in enumerate(self.engine.stream(queries, deadline)):
+                progress(text, (idx + 1) / len(pending))
+                if isinstance(data, FetchError):
+                    swallowed("overpass_type", data)
+                    if on_error:
+                        on_error(r_type, data)
+                    # Shown with whatever the tile cache had for it
+                    failed.add(r_type)
+                else:
+                    store(r_type, data)
+                yield from settle(r_type)
+
+        if not failed:
+            self.result_cache.set(key, batches)
+
+    def stream_nearest(self, lat, lon, k, selected_types, max_radius_km, on_progress=None, on_error=None):
+        """Yield (type, ResultSet, radius_km) with the `k` nearest of each type, searching outward in rings.
+
+        Each ring doubles the radius, up to `max_radius_km`, and only searches
+        the types that don't have `k` results yet; with the tile cache on, a
+        ring only fetches the tiles its predecessor didn't cover. A type is
+        yielded with fewer than `k` results once the maximum radius is reached
+        or its request failed.
+        """
+        pending = [t for t in SERVICE_TAGS if t in selected_types]
+        failed = set()
+        # One deadline for all the rings
+        deadline = time.monotonic() + SEARCH_DEADLINE
+
+        def failure(r_type, error):
+            failed.add(r_type)
+            if on_error:
+                on_error(r_type, error)
+
+        radius_km = min(NEAREST_START_KM, max_radius_km)
+        while pending:
+            last = radius_km >= max_radius_km
+            metrics.inc("nearest_rings_total", len(pending), radius_km=radius_km)
+            for r_type, batch in self.stream_resources(lat, lon, radius_km, pending, on_progress=on_progress,
+                                                       on_error=failure, deadline=deadline):
+                if len(batch) >= k or last or r_type in failed:
+                    pending.remove(r_type)
+                    yield r_type, batch.take(slice(0, k)), radius_km
+            radius_km = min(radius_km * NEAREST_GROWTH, max_radius_km)
+
+    def fetch_nearest(self, lat, lon, k, selected_types, max_radius_km, on_error=None):
+        """(ResultSet of the `k` nearest per type, {type: radius searched})."""
+        batches, radii = [], {}
+        for r_type, batch, radius_km in self.stream_nearest(lat, lon, k, selected_types, max_radius_km,
+                                                            on_error=on_error):
+            batches.append(batch)
+            radii[r_type] = radius_km
+        return ResultSet.concat(batches, (lat, lon)), radii
+
+    def fetch_resources(self, lat, lon, radius_km, selected_types, combined=OVERPASS_COMBINED, fresh_for=0,
+                        on_error=None):
+        batches = self.stream_resources(lat, lon, radius_km, selected_types, combined, on_error=on_error,
+                                        fresh_for=fresh_for)
+        return ResultSet.concat((batch for _, batch in batches), (lat, lon))
@@ -0,0 +1,44 @@
+import threading
+from contextlib import contextmanager
+
+from metrics import metrics, span
+
+
+class SingleFlight:
+    """Lets one caller at a time do the work for a key while identical concurrent callers wait for it.
+
+    The work is expected to fill a cache; waiting callers read the result from
+    there once the first caller is done, so nothing is handed between threads.
+    """
+
+    def __init__(self):
+        self.flights = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def lead(self, name, key, timeout=None):
+        """Yields True if the caller should do the work itself, False once another caller has finished it.
+
+        Callers waiting longer than `timeout` seconds are told to go ahead on
+        their own (True) rather than wait for a stuck request.
+        """
+        with self.lock:
+            done = self.flights.get((name, key))
+            leader = done is None
+            if leader:
+                done = self.flights[(name, key)] = threading.Event()
+
+        if not leader:
+            with span("coalesce_wait", flight=name) as extra:
+                finished = done.wait(timeout)
+                extra['result'] = "shared" if finished else "timeout"
+            metrics.inc("coalesced_requests_total", flight=name, result=extra['result'])
+            yield not finished
+            return
+
+        try:
+            yield True
+        finally:
+            with self.lock:
+                del self.flights[(name, key)]
+            done.set()
@@ -0,0 +1,50 @@
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from prewarm import Prewarmer  # noqa: E402
+from ttl_cache import TTLCache  # noqa: E402
+
+TTL = 3600
+
+
+class FakeCore:
+    """Just enough of SearchCore: one result cache, and a count of searches that went upstream."""
+
+    def __init__(self):
+        self.result_cache = TTLCache(ttl=TTL)
+        self.fetched = []
+
+    def geocode_location(self, place, fresh_for=0):
+        return SimpleNamespace(latitude=28.6, longitude=77.2)
+
+    def result_key(self, lat, lon, radius_km, selected_types):
+        return lat, lon, radius_km, tuple(selected_types)
+
+    def fetch_resources(self, lat, lon, radius_km, selected_types, fresh_for=0):
+        key = self.result_key(lat, lon, radius_km, selected_types)
+        if self.result_cache.get(key, fresh_for=fresh_for) is None:
+            self.fetched.append(radius_km)
+            self.result_cache.set(key, [])
+
+
+def age(core, radius_km, seconds):
+    key = core.result_key(28.6, 77.2, radius_km, ("Hospital",))
+    _, value = core.result_cache.entries[key]
+    core.result_cache.entries[key] = (time.time() - seconds, value)
+
+
+def test_refresh_skips_entries_with_most_of_their_ttl_left():
+    core = FakeCore()
+    prewarmer = Prewarmer(core, [("Delhi", ("Hospital",), 10), ("Delhi", ("Hospital",), 5)],
+                          interval=TTL / 3, pause=0)
+    prewarmer.refresh_all()
+    assert core.fetched == [10, 5]
+
+    # A round later: the 10 km entry still has two thirds of its TTL, the 5 km one expires before the next round
+    age(core, 10, TTL / 3 + 30)
+    age(core, 5, 2 * TTL / 3 + 1)
+    prewarmer.refresh_all()
+    assert core.fetched == [10, 5, 5]
@@ -0,0 +1,121 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from geo import EARTH_RADIUS_KM, haversine_km
+from overpass import element_coords
+
+
+def tile_of(lat, lon, zoom):
+    """Slippy-map (x, y) tile containing a point."""
+    n = 2 ** zoom
+    x = int((lon + 180.0) / 360.0 * n)
+    lat_rad = math.radians(lat)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_bounds(x, y, zoom):
+    """(south, west, north, east) of a tile."""
+    n = 2 ** zoom
+
+    def lat_at(ty):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * ty / n))))
+
+    return lat_at(y + 1), x / n * 360.0 - 180.0, lat_at(y), (x + 1) / n * 360.0 - 180.0
+
+
+def covering_tiles(lat, lon, radius_km, zoom):
+    """Tiles that intersect the search circle."""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    dlon = dlat / max(math.cos(math.radians(lat)), 1e-6)
+    x0, y0 = tile_of(lat + dlat, lon - dlon, zoom)
+    x1, y1 = tile_of(lat - dlat, lon + dlon, zoom)
+
+    tiles = []
+    for y in range(y0, y1 + 1):
+        for x in range(x0, x1 + 1):
+            south, west, north, east = tile_bounds(x, y, zoom)
+            # Closest point of the tile to the centre
+            near_lat = min(max(lat, south), north)
+            near_lon = min(max(lon, west), east)
+            if haversine_km(lat, lon, near_lat, near_lon) <= radius_km:
+                tiles.append((x, y))
+    return tiles
+
+
+def tile_spans(tiles, zoom):
+    """Merge horizontally adjacent tiles into bounding boxes to keep queries short."""
+    boxes = []
+    for y in sorted({ty for _, ty in tiles}):
+        xs = sorted(tx for tx, ty in tiles if ty == y)
+        start = prev = xs[0]
+        for x in xs[1:] + [None]:
+            if x is not None and x == prev + 1:
+                prev = x
+                continue
+            south, west, _, _ = tile_bounds(start, y, zoom)
+            _, _, north, east = tile_bounds(prev, y, zoom)
+            boxes.append((south, west, north, east))
+            if x is not None:
+                start = prev = x
+    return boxes
+
+
+class TileCache:
+    """Overpass elements cached per (service type, slippy-map tile).
+
+    Entries expire after `ttl` seconds; once more than `max_elements` elements
+    are held, least recently used tiles are evicted.
+    """
+
+    def __init__(self, zoom=12, ttl=1800, max_elements=200_000):
+        self.zoom = zoom
+        self.ttl = ttl
+        self.max_elements = max_elements
+        self.size = 0
+        self.tiles = OrderedDict()
+        self.lock = threading.Lock()
+
+    def split(self, r_type, tiles, fresh_for=0):
+        """Return (cached elements, tiles that still need fetching).
+
+        Tiles expiring within `fresh_for` seconds count as needing a fetch.
+        """
+        now = time.time()
+        elements, missing = [], []
+        with self.lock:
+            for tile in tiles:
+                entry = self.tiles.get((r_type, tile))
+                if entry is None or now - entry[0] > self.ttl - fresh_for:
+                    missing.append(tile)
+                    continue
+                self.tiles.move_to_end((r_type, tile))
+                elements.extend(entry[1])
+        return elements, missing
+
+    def store(self, r_type, tiles, elements):
+        """Cache elements fetched for `tiles`; returns those that fall inside them."""
+        now = time.time()
+        buckets = {tile: [] for tile in tiles}
+        for elem in elements:
+            coords = element_coords(elem)
+            if coords is None:
+                continue
+            bucket = buckets.get(tile_of(*coords, self.zoom))
+            # Elements centred outside the fetched tiles belong to another tile
+            if bucket is not None:
+                bucket.append(elem)
+
+        with self.lock:
+            for tile, elems in buckets.items():
+                old = self.tiles.pop((r_type, tile), None)
+                if old is not None:
+                    self.size -= len(old[1])
+                self.tiles[(r_type, tile)] = (now, elems)
+                self.size += len(elems)
+            while self.size > self.max_elements and self.tiles:
+                _, (_, elems) = self.tiles.popitem(last=False)
+                self.size -= len(elems)
+        return [elem for elems in buckets.values() for elem in elems]
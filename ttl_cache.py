@@ -0,0 +1,43 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe in-memory mapping with per-entry expiry and LRU eviction."""
+
+    def __init__(self, ttl, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None, fresh_for=0):
+        """The value for `key`, unless it is missing or expires within `fresh_for` seconds."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return default
+            age = time.time() - entry[0]
+            if age > self.ttl:
+                del self.entries[key]
+                return default
+            if age > self.ttl - fresh_for:
+                return default
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def age(self, key):
+        """Seconds since `key` was set, or None if it is missing or expired; does not count as a use."""
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is None or time.time() - entry[0] > self.ttl:
+            return None
+        return time.time() - entry[0]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = (time.time(), value)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)